@@ -0,0 +1,237 @@
+"""요청 수용 제어 (admission control)
+
+08:00 출근 폭주 때 무거운 관리자 조회가 출퇴근 요청을 굶기지 않도록
+요청을 세 등급으로 나눠 동시 실행 수를 제한한다.
+
+- critical: 출근/퇴근. 전체 슬롯을 쓸 수 있고, 꽉 차면 잠깐 기다림
+- normal:   일반 조회/수정. critical 예약분을 뺀 슬롯만 사용, 꽉 차면 바로 503
+- heavy:    관리자 리포트. 사용자별 토큰 버킷(429) + 별도 동시 실행 제한과
+            길이 제한 대기열(503). 키가 None이면 토큰을 차감하지 않음
+            (페이지를 이어 받는 요청은 목록 조회 한 번으로 셈)
+
+회사(테넌트)별 동시 실행 수도 제한할 수 있다 (tenant_concurrency, 0이면 끔).
+한 회사의 폭주가 공유 슬롯과 DB 연결을 모두 차지하지 않게 하기 위함.
+
+거절은 모두 Retry-After 헤더와 함께 즉시 응답한다 (타임아웃까지 붙잡지 않음).
+"""
+import asyncio
+import json
+import math
+import time
+
+CRITICAL = "critical"
+NORMAL = "normal"
+HEAVY = "heavy"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """토큰을 하나 쓰면 0, 부족하면 다음 토큰까지 남은 초"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: float, detail: str):
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class AdmissionController:
+    """등급별 동시 실행 수, 대기열, 사용자별 요청 속도를 관리 (워커 이벤트 루프 안에서만 사용)"""
+
+    def __init__(self, max_concurrency=40, reserved_critical=10, critical_wait=5.0,
+                 heavy_concurrency=4, heavy_queue=20, heavy_queue_timeout=2.0,
+                 heavy_rate=0.5, heavy_burst=5, tenant_concurrency=0):
+        self.max_concurrency = max_concurrency
+        self.reserved_critical = reserved_critical
+        self.critical_wait = critical_wait
+        self.heavy_concurrency = heavy_concurrency
+        self.heavy_queue = heavy_queue
+        self.heavy_queue_timeout = heavy_queue_timeout
+        self.heavy_rate = heavy_rate
+        self.heavy_burst = heavy_burst
+        self.tenant_concurrency = tenant_concurrency
+
+        self.in_flight = {CRITICAL: 0, NORMAL: 0, HEAVY: 0}
+        self.heavy_running = 0
+        self.heavy_waiting = 0
+        self.heavy_waiting_max = 0
+        self.admitted = {CRITICAL: 0, NORMAL: 0, HEAVY: 0}
+        self.tenant_in_flight = {}
+        self.shed = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0, "overloaded": 0, "tenant_busy": 0}
+        self._buckets = {}
+        self._changed = None
+        self._heavy_slots = None
+
+    @property
+    def total_in_flight(self) -> int:
+        return sum(self.in_flight.values())
+
+    def _tenant_full(self, tenant) -> bool:
+        return (self.tenant_concurrency > 0 and tenant is not None
+                and self.tenant_in_flight.get(tenant, 0) >= self.tenant_concurrency)
+
+    def _condition(self):
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    def _heavy_semaphore(self):
+        if self._heavy_slots is None:
+            self._heavy_slots = asyncio.Semaphore(self.heavy_concurrency)
+        return self._heavy_slots
+
+    async def _wait(self, predicate, timeout) -> bool:
+        cond = self._condition()
+        async with cond:
+            try:
+                await asyncio.wait_for(cond.wait_for(predicate), timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    def _reject(self, reason, retry_after, status_code=503, detail="요청이 많아 잠시 후 다시 시도해주세요"):
+        self.shed[reason] += 1
+        raise Rejected(status_code, reason, retry_after, detail)
+
+    def _take_token(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 10000:
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.is_full()}
+            bucket = self._buckets[key] = TokenBucket(self.heavy_rate, self.heavy_burst)
+        wait = bucket.take()
+        if wait:
+            self._reject("rate_limited", wait, 429, "조회 요청이 너무 잦습니다. 잠시 후 다시 시도해주세요")
+
+    async def acquire(self, kind, key=None, tenant=None):
+        """슬롯 확보 (실패 시 Rejected)"""
+        shared_limit = self.max_concurrency - self.reserved_critical
+
+        if kind == CRITICAL:
+            def has_slot():
+                return self.total_in_flight < self.max_concurrency and not self._tenant_full(tenant)
+            if not has_slot():
+                ok = await self._wait(has_slot, self.critical_wait)
+                if not ok:
+                    self._reject("tenant_busy" if self._tenant_full(tenant) else "overloaded", 1)
+
+        elif kind == HEAVY:
+            if key is not None:
+                self._take_token(key)
+            slots = self._heavy_semaphore()
+            if slots.locked():
+                if self.heavy_waiting >= self.heavy_queue:
+                    self._reject("queue_full", self.heavy_queue_timeout)
+                self.heavy_waiting += 1
+                self.heavy_waiting_max = max(self.heavy_waiting_max, self.heavy_waiting)
+                try:
+                    await asyncio.wait_for(slots.acquire(), self.heavy_queue_timeout)
+                except asyncio.TimeoutError:
+                    self._reject("queue_timeout", self.heavy_queue_timeout)
+                finally:
+                    self.heavy_waiting -= 1
+            else:
+                await slots.acquire()
+            if self.total_in_flight >= shared_limit or self._tenant_full(tenant):
+                slots.release()
+                self._reject("tenant_busy" if self._tenant_full(tenant) else "overloaded", 1)
+            self.heavy_running += 1
+
+        elif self.total_in_flight >= shared_limit:
+            self._reject("overloaded", 1)
+        elif self._tenant_full(tenant):
+            self._reject("tenant_busy", 1)
+
+        self.in_flight[kind] += 1
+        self.admitted[kind] += 1
+        if tenant is not None:
+            self.tenant_in_flight[tenant] = self.tenant_in_flight.get(tenant, 0) + 1
+
+    async def release(self, kind, tenant=None):
+        self.in_flight[kind] -= 1
+        if tenant is not None:
+            self.tenant_in_flight[tenant] -= 1
+            if not self.tenant_in_flight[tenant]:
+                del self.tenant_in_flight[tenant]
+        if kind == HEAVY:
+            self.heavy_running -= 1
+            self._heavy_semaphore().release()
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": dict(self.in_flight),
+            "max_concurrency": self.max_concurrency,
+            "reserved_critical": self.reserved_critical,
+            "tenant_concurrency": self.tenant_concurrency,
+            "tenant_in_flight": dict(self.tenant_in_flight),
+            "heavy_running": self.heavy_running,
+            "heavy_queue_depth": self.heavy_waiting,
+            "heavy_queue_depth_max": self.heavy_waiting_max,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "rate_limited_users": len(self._buckets),
+        }
+
+
+class AdmissionMiddleware:
+    """ASGI 미들웨어 - classify(scope)가 None이면 제한 없이 통과
+
+    tenant(scope)는 회사별 제한 키 (None이면 회사별 제한 없음)
+    """
+
+    def __init__(self, app, controller, classify, identify, tenant=None):
+        self.app = app
+        self.controller = controller
+        self.classify = classify
+        self.identify = identify
+        self.tenant = tenant
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        kind = self.classify(scope)
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        tenant = self.tenant(scope) if self.tenant else None
+        try:
+            await self.controller.acquire(kind, self.identify(scope) if kind == HEAVY else None, tenant)
+        except Rejected as e:
+            body = json.dumps({"detail": e.detail, "reason": e.reason}, ensure_ascii=False).encode()
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(e.retry_after))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await self.controller.release(kind, tenant)
@@ -0,0 +1,87 @@
+"""관리자 대용량 응답 벤치마크 (직원 5,000명)
+
+임시 SQLite DB에 직원/출퇴근 데이터를 만든 뒤 관리자 API 응답 시간과 크기를 측정한다.
+- 직렬화만: jsonable_encoder + json.dumps vs orjson
+- API 전체: format=rows vs format=columnar, gzip 유무
+
+    pip install httpx
+    python benchmarks/admin_payload.py --employees 5000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # main.py는 현재 디렉터리의 flextime.db를 사용하므로 임시 디렉터리에서 실행
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    os.environ["SCHEDULER_ENABLED"] = "0"
+    # 반복 호출이 요청 속도 제한에 걸리지 않도록
+    os.environ["ADMISSION_HEAVY_RATE"] = "1000"
+    os.environ["ADMISSION_HEAVY_BURST"] = "1000"
+    os.environ.pop("DATABASE_URL", None)
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    import orjson
+    import main
+
+    conn = main.get_db()
+    today = main.get_kst_today().isoformat()
+    conn.executemany(
+        "INSERT INTO user (name, email, password, team_id) VALUES (?, ?, 'x', ?)",
+        [(f"직원{i}", f"user{i}@example.com", i % 3 + 1) for i in range(args.employees)]
+    )
+    conn.executemany(
+        "INSERT INTO attendance (user_id, date, clock_in, clock_out, work_minutes) VALUES (?, ?, '08:00', '17:00', 540)",
+        [(i + 2, today) for i in range(args.employees)]
+    )
+    conn.commit()
+
+    token = main.create_access_token({"id": 1, "role": "admin", "team_id": None, "tenant_id": 1})
+    auth = {"Authorization": f"Bearer {token}"}
+
+    print(f"employees={args.employees} (best of {args.repeat})")
+
+    with TestClient(main.app) as client:
+        rows = client.get("/api/admin/all-status", headers={**auth, "Accept-Encoding": "identity"}).json()
+        ms_std, _ = timeit(lambda: json.dumps(jsonable_encoder(rows)).encode(), args.repeat)
+        ms_orjson, _ = timeit(lambda: orjson.dumps(rows), args.repeat)
+        print(f"\n직렬화 (all-status {len(rows)}행)")
+        print(f"  jsonable_encoder + json.dumps: {ms_std:8.1f} ms")
+        print(f"  orjson                       : {ms_orjson:8.1f} ms")
+
+        print("\nAPI 응답")
+        for path in ("/api/admin/all-status", "/api/admin/employees?limit=1000", "/api/admin/hours?period=month"):
+            for fmt in ("rows", "columnar"):
+                for encoding in ("identity", "gzip"):
+                    url = f"{path}{'&' if '?' in path else '?'}format={fmt}"
+                    headers = {**auth, "Accept-Encoding": encoding}
+                    ms, res = timeit(lambda: client.get(url, headers=headers), args.repeat)
+                    size = len(res.content) if encoding == "identity" else int(res.headers.get("content-length", 0))
+                    print(f"  {url:<52} {encoding:<8} {ms:8.1f} ms  {size / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""출근 시간대 로그인 폭주 벤치마크
+
+동시에 N명이 로그인할 때 초당 처리 가능한 로그인 수를 측정한다.
+요청 스레드(uvicorn 스레드풀, 기본 40개)에서 직접 KDF를 돌리는 경우와
+PasswordHasher 프로세스 풀을 거치는 경우를 비교한다.
+
+    python benchmarks/login_burst.py --logins 200 --threads 40
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher, kdf_hash, kdf_verify  # noqa: E402
+
+
+def run_burst(verify, stored, logins, threads):
+    start = time.perf_counter()
+    latencies = []
+
+    def one_login(_):
+        t0 = time.perf_counter()
+        assert verify("123456", stored)
+        latencies.append(time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one_login, range(logins)))
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "logins_per_sec": logins / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    stored = kdf_hash("123456")
+
+    inline = run_burst(kdf_verify, stored, args.logins, args.threads)
+
+    hasher = PasswordHasher(max_workers=args.workers)
+    hasher.warm_up()
+    pooled = run_burst(hasher.verify, stored, args.logins, args.threads)
+    hasher.shutdown()
+
+    print(f"logins={args.logins} threads={args.threads} workers={args.workers}")
+    for name, r in (("inline", inline), ("process pool", pooled)):
+        print(f"{name:>12}: {r['logins_per_sec']:7.1f} logins/s  "
+              f"p50 {r['p50_ms']:7.1f}ms  p99 {r['p99_ms']:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""대한민국 공휴일 계산
+
+양력 공휴일과 대체공휴일 규칙은 계산하고, 음력 공휴일(설날, 부처님오신날, 추석)은
+양력 날짜 표(LUNAR_HOLIDAYS)를 사용한다. 표에 없는 연도는 양력 공휴일만 계산하므로
+달력을 쓰는 쪽에서 표의 범위(min~max) 밖 연도는 받지 않아야 한다.
+선거일, 임시공휴일처럼 규칙이 없는 날은 TEMPORARY_HOLIDAYS에 추가하거나
+관리자가 회사 휴무일로 등록한다.
+"""
+from datetime import date, timedelta
+
+SOLAR_HOLIDAYS = [
+    (1, 1, "신정"),
+    (3, 1, "삼일절"),
+    (5, 5, "어린이날"),
+    (6, 6, "현충일"),
+    (8, 15, "광복절"),
+    (10, 3, "개천절"),
+    (10, 9, "한글날"),
+    (12, 25, "성탄절"),
+]
+
+# 연도: (설날, 부처님오신날, 추석) - 음력 날짜의 양력 환산 (한국천문연구원 음양력 기준)
+LUNAR_HOLIDAYS = {
+    2016: (date(2016, 2, 8), date(2016, 5, 14), date(2016, 9, 15)),
+    2017: (date(2017, 1, 28), date(2017, 5, 3), date(2017, 10, 4)),
+    2018: (date(2018, 2, 16), date(2018, 5, 22), date(2018, 9, 24)),
+    2019: (date(2019, 2, 5), date(2019, 5, 12), date(2019, 9, 13)),
+    2020: (date(2020, 1, 25), date(2020, 4, 30), date(2020, 10, 1)),
+    2021: (date(2021, 2, 12), date(2021, 5, 19), date(2021, 9, 21)),
+    2022: (date(2022, 2, 1), date(2022, 5, 8), date(2022, 9, 10)),
+    2023: (date(2023, 1, 22), date(2023, 5, 27), date(2023, 9, 29)),
+    2024: (date(2024, 2, 10), date(2024, 5, 15), date(2024, 9, 17)),
+    2025: (date(2025, 1, 29), date(2025, 5, 5), date(2025, 10, 6)),
+    2026: (date(2026, 2, 17), date(2026, 5, 24), date(2026, 9, 25)),
+    2027: (date(2027, 2, 7), date(2027, 5, 13), date(2027, 9, 15)),
+    2028: (date(2028, 1, 27), date(2028, 5, 2), date(2028, 10, 3)),
+    2029: (date(2029, 2, 13), date(2029, 5, 20), date(2029, 9, 22)),
+    2030: (date(2030, 2, 3), date(2030, 5, 9), date(2030, 9, 12)),
+    2031: (date(2031, 1, 23), date(2031, 5, 28), date(2031, 10, 1)),
+    2032: (date(2032, 2, 11), date(2032, 5, 16), date(2032, 9, 19)),
+    2033: (date(2033, 1, 31), date(2033, 5, 6), date(2033, 9, 8)),
+    2034: (date(2034, 2, 19), date(2034, 5, 25), date(2034, 9, 27)),
+    2035: (date(2035, 2, 8), date(2035, 5, 15), date(2035, 9, 16)),
+    2036: (date(2036, 1, 28), date(2036, 5, 3), date(2036, 10, 4)),
+}
+
+# 선거일, 임시공휴일
+TEMPORARY_HOLIDAYS = {
+    date(2016, 4, 13): "국회의원 선거일",
+    date(2016, 5, 6): "임시공휴일",
+    date(2017, 5, 9): "대통령 선거일",
+    date(2017, 10, 2): "임시공휴일",
+    date(2018, 6, 13): "지방선거일",
+    date(2020, 4, 15): "국회의원 선거일",
+    date(2020, 8, 17): "임시공휴일",
+    date(2022, 3, 9): "대통령 선거일",
+    date(2022, 6, 1): "지방선거일",
+    date(2023, 10, 2): "임시공휴일",
+    date(2024, 4, 10): "국회의원 선거일",
+    date(2024, 10, 1): "임시공휴일",
+    date(2025, 1, 27): "임시공휴일",
+    date(2025, 6, 3): "대통령 선거일",
+    date(2026, 6, 3): "지방선거일",
+}
+
+# 대체공휴일 적용 시작일 (이날 이후 겹치는 공휴일부터 적용)
+SUBSTITUTE_SINCE = {
+    "설날": date(2014, 1, 1),
+    "추석": date(2014, 1, 1),
+    "어린이날": date(2014, 1, 1),
+    "삼일절": date(2021, 8, 1),
+    "광복절": date(2021, 8, 1),
+    "개천절": date(2021, 8, 1),
+    "한글날": date(2021, 8, 1),
+    "부처님오신날": date(2023, 5, 1),
+    "성탄절": date(2023, 5, 1),
+}
+# 설날/추석 연휴는 일요일과 겹칠 때만, 나머지는 토요일/일요일과 겹칠 때 대체
+SUNDAY_ONLY = {"설날", "추석"}
+
+
+def korean_holidays(year: int) -> dict:
+    """{날짜: 공휴일 이름} (대체공휴일 포함, 주말은 포함하지 않음)"""
+    names = {}      # 날짜 -> [이름, ...]
+    blocks = []     # (대체 판단용 이름, 연휴 날짜 목록)
+
+    def add(day, name):
+        names.setdefault(day, []).append(name)
+        return day
+
+    for month, day, name in SOLAR_HOLIDAYS:
+        blocks.append((name, [add(date(year, month, day), name)]))
+
+    if year in LUNAR_HOLIDAYS:
+        seollal, buddha, chuseok = LUNAR_HOLIDAYS[year]
+        for name, center in (("설날", seollal), ("추석", chuseok)):
+            days = [add(center + timedelta(days=i), name if i == 0 else f"{name} 연휴") for i in (-1, 0, 1)]
+            blocks.append((name, days))
+        blocks.append(("부처님오신날", [add(buddha, "부처님오신날")]))
+
+    for day, name in TEMPORARY_HOLIDAYS.items():
+        if day.year == year:
+            add(day, name)
+
+    # 대체공휴일: 연휴가 끝난 다음 첫 번째 평일 (공휴일, 다른 대체공휴일 제외)
+    # 같은 날 공휴일이 둘 이상 겹쳐도 잃는 날은 하루이므로 대체는 한 번만
+    substituted = set()
+    substitutes = {}
+    for name, days in sorted(blocks, key=lambda b: b[1][0]):
+        since = SUBSTITUTE_SINCE.get(name)
+        if since is None or days[0] < since:
+            continue
+        weekend = (6,) if name in SUNDAY_ONLY else (5, 6)
+        lost = [d for d in days if d not in substituted and (d.weekday() in weekend or len(names[d]) > 1)]
+        candidate = days[-1]
+        for d in lost:
+            substituted.add(d)
+            candidate += timedelta(days=1)
+            while candidate.weekday() >= 5 or candidate in names or candidate in substitutes:
+                candidate += timedelta(days=1)
+            substitutes[candidate] = "대체공휴일"
+
+    holidays = {day: ", ".join(day_names) for day, day_names in names.items() if day.year == year}
+    holidays.update({day: name for day, name in substitutes.items() if day.year == year})
+    return holidays
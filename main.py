@@ -1,14 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Union
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import contextvars
 import sqlite3
 from datetime import datetime, date as date_module, timedelta, timezone
+from decimal import Decimal
+import base64
+import bisect
 import hashlib
+import hmac
+import json
 import math
 import os
+import secrets
+import threading
+import time
+import zlib
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+import orjson
+
+from admission import AdmissionController, AdmissionMiddleware, CRITICAL, HEAVY, NORMAL
+from holidays_kr import LUNAR_HOLIDAYS, korean_holidays
+from passwords import PasswordHasher, kdf_hash
 
 # 한국 시간대
 KST = timezone(timedelta(hours=9))
@@ -19,7 +42,47 @@ def get_kst_now():
 def get_kst_today():
     return datetime.now(KST).date()
 
-app = FastAPI(title="출근하자")
+@asynccontextmanager
+async def lifespan(app):
+    scheduler.start()
+    replica_router.start()
+    yield
+    await replica_router.stop()
+    await scheduler.stop()
+    password_hasher.shutdown()
+
+def _json_default(obj):
+    # PostgreSQL SUM() 결과는 Decimal
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    raise TypeError
+
+class FastJSONResponse(JSONResponse):
+    """orjson으로 직렬화하는 기본 응답 클래스"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+
+app = FastAPI(title="출근하자", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# 출근 폭주 대비 요청 수용 제어 (CORS 안쪽에 두어 429/503에도 CORS 헤더가 붙게 함)
+admission = AdmissionController(
+    max_concurrency=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", 40)),
+    reserved_critical=int(os.environ.get("ADMISSION_RESERVED_CRITICAL", 10)),
+    heavy_concurrency=int(os.environ.get("ADMISSION_HEAVY_CONCURRENCY", 4)),
+    heavy_queue=int(os.environ.get("ADMISSION_HEAVY_QUEUE", 20)),
+    heavy_rate=float(os.environ.get("ADMISSION_HEAVY_RATE", 0.5)),
+    heavy_burst=int(os.environ.get("ADMISSION_HEAVY_BURST", 5)),
+    tenant_concurrency=int(os.environ.get("ADMISSION_TENANT_CONCURRENCY", 0)),
+)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    # 아래쪽에 정의된 함수를 요청 시점에 찾도록 lambda로 감쌈
+    classify=lambda scope: classify_request(scope),
+    identify=lambda scope: identify_request(scope),
+    tenant=lambda scope: tenant_of_request(scope),
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,30 +90,201 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# 큰 응답만 gzip 압축 (GZIP_MIN_SIZE=0이면 끔)
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", 4096))
+if GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
 # ==================== 회사 설정 ====================
+# 회사별 설정의 기본값 (회사마다 바꾼 값은 tenant.settings에 저장)
 COMPANY_SETTINGS = {
     "latitude": 35.84706729510516,      # 회사 위도
     "longitude": 127.14263183020292,    # 회사 경도
     "radius_meters": 200,     # 출근 허용 반경
     "weekly_hours": 40,
+    "max_weekly_hours": 52,      # 법정 주 최대 근로시간
+    "warning_weekly_hours": 48,  # 이 시간 이상이면 주의 대상
     "default_in": "08:00",
-    "default_out": "17:00"
+    "default_out": "17:00",
+    "auto_close_at": "03:00"     # 이 시각에 전날까지 퇴근 안 한 세션 자동 종료
 }
 
 # ==================== 데이터베이스 ====================
 DATABASE_URL = os.environ.get("DATABASE_URL")
+# 읽기 전용 복제본 (쉼표로 구분, PostgreSQL일 때만 사용)
+DATABASE_REPLICA_URLS = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))              # 초, 이보다 늦으면 primary 사용
+READ_YOUR_WRITES_WINDOW = float(os.environ.get("READ_YOUR_WRITES_WINDOW", 10))  # 초, 쓰기 직후 primary에서 읽는 시간
+READ_YOUR_WRITES_COOKIE = "flextime_last_write"  # 클라이언트가 들고 다니는 마지막 쓰기 시각
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get("REPLICA_CONNECT_TIMEOUT", 2))      # 초, 복제본 접속 대기 한도
+REPLICA_RETRY_AFTER = float(os.environ.get("REPLICA_RETRY_AFTER", 30))           # 초, 접속 실패한 복제본을 빼두는 시간
+
+def _connect_postgres(url, connect_timeout=None):
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    # Render는 postgres:// 대신 postgresql://를 사용
+    options = {"connect_timeout": connect_timeout} if connect_timeout else {}
+    return psycopg2.connect(url.replace("postgres://", "postgresql://"), cursor_factory=RealDictCursor, **options)
+
+class ReplicaRouter:
+    """읽기 요청을 복제본으로 분산
+
+    - 최근에 쓰기를 한 클라이언트는 READ_YOUR_WRITES_WINDOW 동안 primary에서 읽음
+      (마지막 쓰기 시각은 워커 메모리가 아니라 클라이언트 쿠키에 두므로 다른 워커로 가도 유지)
+    - 복제 지연이 REPLICA_MAX_LAG를 넘거나 접속이 안 되는 복제본은 건너뜀
+    - 지연은 백그라운드 작업이 LAG_CHECK_INTERVAL마다 확인 (요청 처리 중에는 접속하지 않음)
+    - 접속이 실패한 복제본은 REPLICA_RETRY_AFTER 동안 빼둠
+    - 확인한 지 LAG_STALE_AFTER가 지난 값은 믿지 않음 (확인 작업이 멈춰도 primary로)
+    """
+    LAG_CHECK_INTERVAL = 1.0
+    LAG_STALE_AFTER = 10.0
+
+    def __init__(self, urls):
+        self.urls = urls
+        self._lag = {}              # url -> (확인 시각, 지연 초)
+        self._down_until = {}       # url -> 다시 확인할 시각 (접속 실패)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._task = None
+
+    def mark_write(self):
+        """이번 요청에서 쓰기를 함 - 이후 읽기는 primary, 응답 쿠키로 클라이언트에 알림"""
+        state = _request_writes.get()
+        if state is not None:
+            state["last_write"] = time.time()
+            state["wrote"] = True
+
+    def mark_down(self, url):
+        """접속 실패 - REPLICA_RETRY_AFTER 동안 읽기에 쓰지 않음"""
+        self._down_until[url] = time.time() + REPLICA_RETRY_AFTER
+        self._lag[url] = (time.time(), float("inf"))
+
+    def _probe(self, url):
+        """복제본 하나의 지연 확인 (백그라운드 스레드에서 실행)"""
+        try:
+            conn = _connect_postgres(url, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+            try:
+                c = conn.cursor()
+                # WAL을 모두 반영했으면 0, 아니면 마지막 반영 이후 경과 시간
+                c.execute("""
+                    SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                           ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                           END AS lag
+                """)
+                lag = float(c.fetchone()["lag"])
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Replica check failed ({e}), using primary for {REPLICA_RETRY_AFTER:.0f}s")
+            self.mark_down(url)
+            return
+        self._lag[url] = (time.time(), lag)
+
+    def _replica_lag(self, url):
+        checked = self._lag.get(url)
+        if not checked or time.time() - checked[0] > self.LAG_STALE_AFTER:
+            return float("inf")
+        return checked[1]
+
+    def start(self):
+        if self.urls and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            for url in self.urls:
+                if time.time() >= self._down_until.get(url, 0):
+                    await asyncio.to_thread(self._probe, url)
+            await asyncio.sleep(self.LAG_CHECK_INTERVAL)
+
+    def pick(self):
+        """읽기에 사용할 복제본 URL (primary를 써야 하면 None)"""
+        if not self.urls:
+            return None
+        state = _request_writes.get()
+        if state and state["last_write"] and time.time() - state["last_write"] < READ_YOUR_WRITES_WINDOW:
+            return None
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.urls)
+        for i in range(len(self.urls)):
+            url = self.urls[(start + i) % len(self.urls)]
+            if self._replica_lag(url) <= REPLICA_MAX_LAG:
+                return url
+        return None
+
+# 요청마다 {"last_write": 클라이언트의 마지막 쓰기 시각, "wrote": 이번 요청에서 쓰기 여부}
+# (dict를 공유하므로 스레드풀에서 실행되는 엔드포인트가 바꾼 값도 미들웨어에서 보임)
+_request_writes = contextvars.ContextVar("request_writes", default=None)
+
+class ReadYourWritesMiddleware:
+    """마지막 쓰기 시각을 쿠키로 주고받는 ASGI 미들웨어 (복제본이 있을 때만 동작)
+
+    요청 쿠키의 값을 replica_router.pick()이 읽고, 쓰기를 한 요청의 응답에는
+    READ_YOUR_WRITES_WINDOW 동안 유지되는 쿠키를 새로 붙임
+    """
+
+    def __init__(self, app, router):
+        self.app = app
+        self.router = router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.router.urls:
+            return await self.app(scope, receive, send)
+        state = {"last_write": self._cookie_value(scope), "wrote": False}
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                cookie = (f"{READ_YOUR_WRITES_COOKIE}={state['last_write']:.3f}; Path=/; "
+                          f"Max-Age={math.ceil(READ_YOUR_WRITES_WINDOW)}; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _request_writes.set(state)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
 
-def get_db():
+    @staticmethod
+    def _cookie_value(scope):
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(READ_YOUR_WRITES_COOKIE)
+                try:
+                    return float(morsel.value) if morsel else None
+                except ValueError:
+                    return None
+        return None
+
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS if DATABASE_URL else [])
+app.add_middleware(ReadYourWritesMiddleware, router=replica_router)
+
+def get_db(readonly=False):
+    """readonly=True면 복제본 사용 가능 (이 요청/클라이언트가 최근에 쓰기를 했으면 primary)"""
     if DATABASE_URL:
         # PostgreSQL (Render)
-        import psycopg2
-        from psycopg2.extras import RealDictCursor
-        # Render는 postgres:// 대신 postgresql://를 사용
-        db_url = DATABASE_URL.replace("postgres://", "postgresql://")
-        conn = psycopg2.connect(db_url, cursor_factory=RealDictCursor)
-        return conn
+        if readonly:
+            replica_url = replica_router.pick()
+            if replica_url:
+                try:
+                    return _connect_postgres(replica_url, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+                except Exception as e:
+                    print(f"Replica connect failed ({e}), using primary")
+                    replica_router.mark_down(replica_url)
+        return _connect_postgres(DATABASE_URL)
     else:
         # SQLite (로컬)
         conn = sqlite3.connect('flextime.db', check_same_thread=False)
@@ -77,6 +311,442 @@ def db_execute(cursor, query, params=None):
         cursor.execute(query)
     return cursor
 
+def db_execute_values(cursor, query, rows, page_size=500):
+    """여러 행을 한 번의 INSERT로 실행 - query의 {values} 자리에 (?, ?), (?, ?) ... 채움"""
+    rows = list(rows)
+    for i in range(0, len(rows), page_size):
+        chunk = rows[i:i + page_size]
+        row_placeholder = "(" + ", ".join(["?"] * len(chunk[0])) + ")"
+        db_execute(cursor, query.format(values=", ".join([row_placeholder] * len(chunk))),
+                   [v for row in chunk for v in row])
+    return cursor
+
+# ==================== 근무시간 집계 ====================
+# daily_hours / weekly_hours: 종료된 세션의 근무시간을 세션이 닫힐 때마다 증분 반영
+# (주 52시간 관리 시 attendance 전체를 다시 읽지 않기 위함)
+
+def week_start_of(day: str) -> str:
+    d = date_module.fromisoformat(day)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def record_work_minutes(c, tenant_id, user_id, day, delta):
+    """세션 종료/수정 시 호출 - 호출한 쪽 트랜잭션 안에서 집계에 delta(분) 반영"""
+    if not delta:
+        return
+    db_execute(c, """
+        INSERT INTO daily_hours (tenant_id, user_id, date, minutes) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, date) DO UPDATE SET minutes = daily_hours.minutes + excluded.minutes
+    """, (tenant_id, user_id, day, delta))
+    db_execute(c, """
+        INSERT INTO weekly_hours (tenant_id, user_id, week_start, minutes) VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, week_start) DO UPDATE SET minutes = weekly_hours.minutes + excluded.minutes
+    """, (tenant_id, user_id, week_start_of(day), delta))
+
+def iter_daily_minutes(conn, tenant_id, date_from=None, date_to=None, batch_size=5000):
+    """한 회사 attendance의 (user_id, date, 근무분)을 사용자 → 날짜 순으로 스트리밍
+
+    PostgreSQL은 서버 측 커서를 사용해 결과 전체를 메모리에 올리지 않음
+    """
+    if DATABASE_URL:
+        c = conn.cursor(name="daily_minutes_stream")
+        c.itersize = batch_size
+    else:
+        c = conn.cursor()
+    conditions, params = ["tenant_id = ?"], [tenant_id]
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+    db_execute(c, f"""
+        SELECT user_id, date, SUM(work_minutes) AS minutes
+        FROM attendance WHERE {' AND '.join(conditions)}
+        GROUP BY user_id, date
+        ORDER BY user_id, date
+    """, params)
+    while True:
+        rows = c.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            yield row["user_id"], row["date"], row["minutes"] or 0
+    c.close()
+
+class WorkHoursRebuilder:
+    """iter_daily_minutes 결과로 한 회사의 daily_hours/weekly_hours를 다시 채움
+
+    date_from/date_to는 주 단위(월~일)로 맞춰서 넘겨야 주간 합계가 잘리지 않음
+    """
+
+    def __init__(self, conn, tenant_id, date_from=None, date_to=None, batch_size=5000):
+        self.c = conn.cursor()
+        self.tenant_id = tenant_id
+        self.batch_size = batch_size
+        self._daily = []
+        self._weekly = {}
+        for table, column in (("daily_hours", "date"), ("weekly_hours", "week_start")):
+            conditions, params = ["tenant_id = ?"], [tenant_id]
+            if date_from:
+                conditions.append(f"{column} >= ?")
+                params.append(date_from)
+            if date_to:
+                conditions.append(f"{column} <= ?")
+                params.append(date_to)
+            db_execute(self.c, f"DELETE FROM {table} WHERE {' AND '.join(conditions)}", params)
+
+    def add(self, user_id, day, minutes):
+        if not minutes:
+            return
+        self._daily.append((self.tenant_id, user_id, day, minutes))
+        key = (user_id, week_start_of(day))
+        self._weekly[key] = self._weekly.get(key, 0) + minutes
+        if len(self._daily) >= self.batch_size:
+            self._flush_daily()
+
+    def _flush_daily(self):
+        if self._daily:
+            db_execute_values(
+                self.c, "INSERT INTO daily_hours (tenant_id, user_id, date, minutes) VALUES {values}", self._daily
+            )
+            self._daily = []
+
+    def finish(self):
+        self._flush_daily()
+        if self._weekly:
+            db_execute_values(
+                self.c, "INSERT INTO weekly_hours (tenant_id, user_id, week_start, minutes) VALUES {values}",
+                [(self.tenant_id, u, w, m) for (u, w), m in self._weekly.items()]
+            )
+        self._weekly = {}
+
+# ==================== 변경 이력 ====================
+# 급여/인사 시스템 연동용 추가 전용 로그 - 출퇴근/휴가를 바꾸는 트랜잭션 안에서 함께 기록
+# 소비자는 /api/changes?since=<cursor>로 마지막으로 받은 이후의 변경만 가져감
+CHANGE_LOG_LOCK_KEY = 4022  # pg advisory lock 키 (회사별 id 순서 = 커밋 순서 보장용, 두 번째 키는 회사 id)
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get("CHANGE_LOG_RETENTION_DAYS", 90))  # 0이면 보관 기한 없음
+
+def record_changes(c, changes):
+    """변경 이력 추가 - 호출한 쪽 트랜잭션에서 commit 직전에 호출
+
+    changes: (tenant_id, entity, op, entity_id, user_id, data) 목록
+    PostgreSQL은 id 발급 순서와 커밋 순서가 어긋나면 소비자가 늦게 커밋된 변경을
+    건너뛸 수 있으므로, commit까지 트랜잭션 advisory lock을 잡고 id를 발급받는다.
+    소비자는 회사별로 읽으므로 잠금도 회사별 (다른 회사의 출퇴근은 서로 기다리지 않음).
+    여러 회사를 잠글 때는 교착을 피하려고 항상 회사 id 순서로 잡는다.
+    """
+    if not changes:
+        return
+    if DATABASE_URL:
+        for tenant_id in sorted({change[0] for change in changes}):
+            db_execute(c, "SELECT pg_advisory_xact_lock(?, ?)", (CHANGE_LOG_LOCK_KEY, tenant_id))
+    now = get_kst_now().strftime("%Y-%m-%d %H:%M:%S")
+    db_execute_values(
+        c, "INSERT INTO change_log (tenant_id, entity, op, entity_id, user_id, data, created_at) VALUES {values}",
+        [(tenant_id, entity, op, entity_id, user_id, json.dumps(data, ensure_ascii=False), now)
+         for tenant_id, entity, op, entity_id, user_id, data in changes]
+    )
+
+def record_change(c, tenant_id, entity, op, entity_id, user_id, data):
+    record_changes(c, [(tenant_id, entity, op, entity_id, user_id, data)])
+
+def attendance_change(row) -> dict:
+    return {k: row[k] for k in ("id", "user_id", "date", "clock_in", "clock_out", "work_minutes")}
+
+# ==================== 연차 원장 ====================
+# leave_ledger: 연차 증감 기록 (grant 부여/조정, use 사용, cancel 취소, expire 소멸), days는 부호 포함
+# leave_balance: 사용자/연도별 잔액 캐시 - 원장과 같은 트랜잭션에서 갱신, 원장 합계로 언제든 재계산 가능
+# 연차는 휴가 날짜의 연도 기준으로 차감하고, 연도가 지나면 남은 연차는 소멸
+LEAVE_DAYS = {"annual": 1.0, "half_am": 0.5, "half_pm": 0.5}
+
+def add_leave_entries(c, entries):
+    """원장 기록 추가 - entries: (tenant_id, user_id, year, kind, days, leave_id) 목록"""
+    if not entries:
+        return
+    now = get_kst_now().strftime("%Y-%m-%d %H:%M:%S")
+    db_execute_values(
+        c, "INSERT INTO leave_ledger (tenant_id, user_id, year, kind, days, leave_id, created_at) VALUES {values}",
+        [tuple(entry) + (now,) for entry in entries]
+    )
+
+def ensure_leave_year(c, user_id, year):
+    """해당 연도 잔액이 없으면 연차(annual_leave_total)를 부여하며 생성
+
+    지난 연도는 새로 부여하지 않음 (원장 도입 전이거나 이미 마감된 해)
+    """
+    if year < get_kst_today().year:
+        return
+    db_execute(c, """
+        INSERT INTO leave_balance (tenant_id, user_id, year, granted, used, expired)
+        SELECT tenant_id, id, ?, annual_leave_total, 0, 0 FROM user WHERE id = ?
+        ON CONFLICT(user_id, year) DO NOTHING
+        RETURNING tenant_id, granted
+    """, (year, user_id))
+    row = c.fetchone()
+    if row:
+        add_leave_entries(c, [(row["tenant_id"], user_id, year, "grant", row["granted"], None)])
+
+def use_leave_days(c, tenant_id, user_id, year, days, leave_id) -> bool:
+    """잔액이 충분할 때만 한 번의 조건부 UPDATE로 차감 (부족하면 False)"""
+    ensure_leave_year(c, user_id, year)
+    db_execute(c, """
+        UPDATE leave_balance SET used = used + ?
+        WHERE user_id = ? AND year = ? AND granted - used - expired >= ?
+    """, (days, user_id, year, days))
+    if c.rowcount == 0:
+        return False
+    add_leave_entries(c, [(tenant_id, user_id, year, "use", -days, leave_id)])
+    return True
+
+def restore_leave_days(c, tenant_id, user_id, year, days, leave_id):
+    """휴가 취소 시 복원 (원장 도입 전 연도의 휴가는 잔액이 없으므로 건너뜀)"""
+    db_execute(c, 
+        "UPDATE leave_balance SET used = used - ? WHERE user_id = ? AND year = ?",
+        (days, user_id, year)
+    )
+    if c.rowcount:
+        add_leave_entries(c, [(tenant_id, user_id, year, "cancel", days, leave_id)])
+
+def recompute_leave_balances(c, year_from: int):
+    """year_from 이후 잔액 캐시를 원장 합계로 한 번에 다시 계산"""
+    db_execute(c, """
+        INSERT INTO leave_balance (tenant_id, user_id, year, granted, used, expired)
+        SELECT tenant_id, user_id, year,
+               SUM(CASE WHEN kind = 'grant' THEN days ELSE 0 END),
+               -SUM(CASE WHEN kind IN ('use', 'cancel') THEN days ELSE 0 END),
+               -SUM(CASE WHEN kind = 'expire' THEN days ELSE 0 END)
+        FROM leave_ledger WHERE year >= ?
+        GROUP BY tenant_id, user_id, year
+        ON CONFLICT(user_id, year) DO UPDATE SET
+        granted = excluded.granted, used = excluded.used, expired = excluded.expired
+    """, (year_from,))
+
+# 조회용: 올해 잔액 (잔액 행이 아직 없으면 부여 예정인 annual_leave_total, 사용 0)
+LEAVE_BALANCE_JOIN = "LEFT JOIN leave_balance b ON b.user_id = u.id AND b.year = ?"
+LEAVE_TOTAL_SQL = "COALESCE(b.granted, u.annual_leave_total)"
+LEAVE_USED_SQL = "COALESCE(b.used, 0)"
+
+# ==================== 회사 (테넌트) ====================
+# 한 배포에서 여러 회사를 운영 - 모든 테이블에 tenant_id, 토큰에 tid
+# 기존 단일 회사 데이터는 기본 회사(1) 소속
+DEFAULT_TENANT_ID = 1
+TENANT_TABLES = ("team", "user", "attendance", "schedule", "leave", "daily_hours", "weekly_hours", "change_log")
+TENANT_CACHE_TTL = float(os.environ.get("TENANT_CACHE_TTL", 30))  # 초, 다른 워커의 설정 변경이 반영되는 최대 지연
+DEFAULT_TEAMS = ("개발팀", "기획팀", "연구팀")
+
+def tenant_ids(c) -> list:
+    db_execute(c, "SELECT id FROM tenant ORDER BY id")
+    return [row["id"] for row in c.fetchall()]
+
+def seed_tenant(c, tenant_id, admin_name, admin_email, admin_password):
+    """회사 기본 팀과 관리자 계정 생성 (이미 있으면 건너뜀, admin_password가 None이면 팀만)"""
+    db_execute_values(
+        c, "INSERT INTO team (tenant_id, name) VALUES {values} ON CONFLICT DO NOTHING",
+        [(tenant_id, name) for name in DEFAULT_TEAMS]
+    )
+    if admin_password is None:
+        return
+    db_execute(c, """
+        INSERT INTO user (tenant_id, name, email, password, team_id, role)
+        VALUES (?, ?, ?, ?, NULL, 'admin') ON CONFLICT DO NOTHING
+    """, (tenant_id, admin_name, admin_email, admin_password))
+
+class TenantCache:
+    """회사 설정, 회사 코드, 사용자 → 회사 매핑 캐시 (워커 메모리)
+
+    - 설정: TENANT_CACHE_TTL 동안 캐시 (이 워커에서 바꾸면 바로 무효화)
+    - 회사 코드, 사용자의 회사는 바뀌지 않으므로 만료 없이 캐시
+    """
+    MAX_USERS = 100000
+
+    def __init__(self):
+        self._settings = {}     # tenant_id -> (조회 시각, 설정)
+        self._codes = {}        # code -> tenant_id
+        self._users = {}        # user_id -> tenant_id
+
+    def _fetch_one(self, query, params):
+        # 방금 만든 회사/사용자도 찾을 수 있도록 primary에서 조회
+        conn = get_db()
+        c = conn.cursor()
+        db_execute(c, query, params)
+        return c.fetchone()
+
+    def settings(self, tenant_id) -> dict:
+        """회사 설정 (저장된 값이 없는 항목은 COMPANY_SETTINGS 기본값)"""
+        cached = self._settings.get(tenant_id)
+        if cached and time.time() - cached[0] < TENANT_CACHE_TTL:
+            return cached[1]
+        row = self._fetch_one("SELECT settings FROM tenant WHERE id = ?", (tenant_id,))
+        if not row:
+            raise HTTPException(status_code=404, detail="회사를 찾을 수 없습니다")
+        settings = {**COMPANY_SETTINGS, **json.loads(row["settings"] or "{}")}
+        self._settings[tenant_id] = (time.time(), settings)
+        return settings
+
+    def invalidate(self, tenant_id):
+        self._settings.pop(tenant_id, None)
+
+    def resolve(self, code: str) -> int:
+        """회사 코드 → id"""
+        if code not in self._codes:
+            row = self._fetch_one("SELECT id FROM tenant WHERE code = ?", (code,))
+            if not row:
+                raise HTTPException(status_code=404, detail="회사를 찾을 수 없습니다")
+            self._codes[code] = row["id"]
+        return self._codes[code]
+
+    def tenant_of_user(self, user_id: int):
+        """사용자의 회사 id (없는 사용자면 None)"""
+        if user_id not in self._users:
+            row = self._fetch_one("SELECT tenant_id FROM user WHERE id = ?", (user_id,))
+            if not row:
+                return None
+            if len(self._users) >= self.MAX_USERS:
+                self._users = {}
+            self._users[user_id] = row["tenant_id"]
+        return self._users[user_id]
+
+tenant_cache = TenantCache()
+
+# ==================== 근무일 달력 ====================
+# calendar_day: 날짜별 근무일 여부와 공휴일 이름 (CALENDAR_YEARS를 서버 시작 시 미리 계산해 저장)
+# company_holiday: 회사별 휴무일 (창립기념일, 하계 휴무 등 관리자가 등록)
+CALENDAR_YEARS = range(min(LUNAR_HOLIDAYS), max(LUNAR_HOLIDAYS) + 1)
+# API로 조회/등록할 수 있는 연도 (올해 ± CALENDAR_WINDOW_YEARS 중 음력 공휴일 표가 있는 해만)
+CALENDAR_WINDOW_YEARS = 10
+# 캐시가 채울 수 있는 최대 연도 폭 (이보다 넓은 빈 구간은 계산하지 않음)
+CALENDAR_MAX_SPAN_YEARS = 100
+
+def calendar_rows(year: int) -> list:
+    """한 해의 (날짜, 근무일 여부, 공휴일 이름) 목록"""
+    holidays = korean_holidays(year)
+    day, rows = date_module(year, 1, 1), []
+    while day.year == year:
+        name = holidays.get(day)
+        rows.append((day.isoformat(), int(day.weekday() < 5 and name is None), name))
+        day += timedelta(days=1)
+    return rows
+
+def sync_calendar(c):
+    """calendar_day를 현재 공휴일 규칙에 맞춤 (바뀐 날짜만 다시 씀)"""
+    db_execute(c, "SELECT date, is_workday, holiday FROM calendar_day")
+    stored = {row["date"]: (row["is_workday"], row["holiday"]) for row in c.fetchall()}
+    changed = [row for year in CALENDAR_YEARS for row in calendar_rows(year) if stored.get(row[0]) != row[1:]]
+    if changed:
+        db_execute_values(c, """
+            INSERT INTO calendar_day (date, is_workday, holiday) VALUES {values}
+            ON CONFLICT(date) DO UPDATE SET is_workday = excluded.is_workday, holiday = excluded.holiday
+        """, changed)
+
+class WorkCalendar:
+    """근무일 달력 캐시 (워커 메모리)
+
+    - calendar_day는 처음 쓸 때 한 번 읽어 둠 (저장 범위 밖 연도는 계산해서 추가)
+    - 회사 휴무일은 회사별로 TENANT_CACHE_TTL 동안 캐시 (이 워커에서 바꾸면 바로 무효화)
+    """
+
+    def __init__(self):
+        self._dates = []        # 캐시한 모든 날짜 (정렬됨, 기간 조회용)
+        self._off = {}          # 쉬는 날 -> 공휴일 이름 (이름 없는 주말은 "")
+        self._years = set()
+        self._closures = {}     # tenant_id -> (조회 시각, {날짜: 이름})
+        self._lock = threading.Lock()
+
+    def _add_rows(self, rows):
+        for day, is_workday, name in rows:
+            self._years.add(int(day[:4]))
+            if not is_workday:
+                self._off[day] = name or ""
+        # 읽는 쪽은 잠금 없이 쓰므로 새 리스트로 교체
+        self._dates = sorted(self._dates + [row[0] for row in rows])
+
+    def _ensure_years(self, first: int, last: int):
+        with self._lock:
+            if not self._years:
+                conn = get_db(readonly=True)
+                c = conn.cursor()
+                db_execute(c, "SELECT date, is_workday, holiday FROM calendar_day")
+                self._add_rows([(row["date"], row["is_workday"], row["holiday"]) for row in c.fetchall()])
+            # 중간에 빈 연도가 없어야 기간 조회가 맞으므로 캐시 범위까지 이어서 계산
+            if self._years:
+                first, last = min(first, min(self._years)), max(last, max(self._years))
+            if last - first >= CALENDAR_MAX_SPAN_YEARS:
+                raise ValueError(f"달력 범위가 너무 넓습니다 ({first}~{last})")
+            missing = [year for year in range(first, last + 1) if year not in self._years]
+            if missing:
+                self._add_rows([row for year in missing for row in calendar_rows(year)])
+
+    def closures(self, tenant_id) -> dict:
+        cached = self._closures.get(tenant_id)
+        if cached and time.time() - cached[0] < TENANT_CACHE_TTL:
+            return cached[1]
+        conn = get_db()
+        c = conn.cursor()
+        db_execute(c, "SELECT date, name FROM company_holiday WHERE tenant_id = ?", (tenant_id,))
+        closures = {row["date"]: row["name"] for row in c.fetchall()}
+        self._closures[tenant_id] = (time.time(), closures)
+        return closures
+
+    def invalidate(self, tenant_id):
+        self._closures.pop(tenant_id, None)
+
+    def _range(self, date_from: str, date_to: str) -> list:
+        self._ensure_years(int(date_from[:4]), int(date_to[:4]))
+        dates = self._dates
+        return dates[bisect.bisect_left(dates, date_from):bisect.bisect_right(dates, date_to)]
+
+    def dates(self, date_from: str, date_to: str) -> list:
+        """기간 안의 모든 날짜"""
+        return self._range(date_from, date_to)
+
+    def day_off(self, tenant_id, day: str):
+        """쉬는 날이면 이유 (공휴일/휴무일 이름, 주말이면 "주말"), 근무일이면 None"""
+        self._ensure_years(int(day[:4]), int(day[:4]))
+        closures = self.closures(tenant_id)
+        if day in closures:
+            return closures[day]
+        if day in self._off:
+            return self._off[day] or "주말"
+        return None
+
+    def work_days(self, tenant_id, date_from: str, date_to: str) -> list:
+        """기간 안의 근무일 (주말, 공휴일, 회사 휴무일 제외)"""
+        closures = self.closures(tenant_id)
+        return [d for d in self._range(date_from, date_to) if d not in self._off and d not in closures]
+
+    def holidays(self, tenant_id, date_from: str, date_to: str) -> dict:
+        """기간 안의 공휴일과 회사 휴무일 {날짜: 이름} (이름 없는 주말 제외)"""
+        closures = self.closures(tenant_id)
+        result = {}
+        for d in self._range(date_from, date_to):
+            name = closures.get(d) or self._off.get(d)
+            if name:
+                result[d] = name
+        return result
+
+work_calendar = WorkCalendar()
+
+def parse_calendar_date(value: str, field: str = "date", fmt: str = "%Y-%m-%d") -> date_module:
+    """요청의 날짜 검증 - 형식이 틀리거나 달력 범위(check_calendar_year) 밖이면 400"""
+    try:
+        day = datetime.strptime(value, fmt).date()
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{field} 형식이 올바르지 않습니다")
+    check_calendar_year(day.year)
+    return day
+
+def check_calendar_year(year: int):
+    """올해 ± CALENDAR_WINDOW_YEARS이면서 CALENDAR_YEARS 안인 해만 허용 (표 밖이면 음력 공휴일이 빠지므로)"""
+    this_year = get_kst_today().year
+    first = max(this_year - CALENDAR_WINDOW_YEARS, CALENDAR_YEARS.start)
+    last = min(this_year + CALENDAR_WINDOW_YEARS, CALENDAR_YEARS.stop - 1)
+    if not first <= year <= last:
+        raise HTTPException(status_code=400, detail=f"{first}~{last}년만 가능합니다")
+
+def target_minutes(settings, work_day_count: int) -> int:
+    """근무일 수 → 목표 근무시간(분) (주 소정근로시간을 5일로 나눈 하루 기준)"""
+    return round(work_day_count * settings["weekly_hours"] * 60 / 5)
+
 def init_db():
     conn = get_db()
     c = conn.cursor()
@@ -84,10 +754,19 @@ def init_db():
     
     if DATABASE_URL:
         # PostgreSQL
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS tenant (
+            id SERIAL PRIMARY KEY,
+            code TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            settings TEXT NOT NULL DEFAULT '{}'
+        )''')
+        
         db_execute(c, '''CREATE TABLE IF NOT EXISTS team (
             id SERIAL PRIMARY KEY,
-            name TEXT NOT NULL UNIQUE
+            name TEXT NOT NULL
         )''')
+        # 팀 이름은 회사별로 유일 (idx_team_tenant_name)
+        db_execute(c, "ALTER TABLE team DROP CONSTRAINT IF EXISTS team_name_key")
         
         db_execute(c, '''CREATE TABLE IF NOT EXISTS "user" (
             id SERIAL PRIMARY KEY,
@@ -127,11 +806,29 @@ def init_db():
         )''')
     else:
         # SQLite
-        db_execute(c, '''CREATE TABLE IF NOT EXISTS team (
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS tenant (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE
+            code TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            settings TEXT NOT NULL DEFAULT '{}'
         )''')
         
+        # 팀 이름은 회사별로 유일 (idx_team_tenant_name) - 기존 UNIQUE(name) 테이블은 새로 만들기
+        db_execute(c, "SELECT sql FROM sqlite_master WHERE type='table' AND name='team'")
+        result = c.fetchone()
+        team_sql = '''CREATE TABLE team (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL
+        )'''
+        if result and 'UNIQUE' in (result[0] or ''):
+            # user의 외래키가 team을 계속 가리키도록 새 테이블을 만든 뒤 이름을 바꿈
+            db_execute(c, team_sql.replace("CREATE TABLE team", "CREATE TABLE team_new"))
+            db_execute(c, "INSERT INTO team_new (id, name) SELECT id, name FROM team")
+            db_execute(c, "DROP TABLE team")
+            db_execute(c, "ALTER TABLE team_new RENAME TO team")
+        elif not result:
+            db_execute(c, team_sql)
+        
         db_execute(c, '''CREATE TABLE IF NOT EXISTS user (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             team_id INTEGER,
@@ -191,35 +888,177 @@ def init_db():
             UNIQUE(user_id, date)
         )''')
     
-    # 기본 팀 생성
-    try:
-        db_execute(c, f"INSERT INTO team (name) VALUES ({ph})", ('개발팀',))
-    except:
-        pass
-    try:
-        db_execute(c, f"INSERT INTO team (name) VALUES ({ph})", ('기획팀',))
-    except:
-        pass
-    try:
-        db_execute(c, f"INSERT INTO team (name) VALUES ({ph})", ('연구팀',))
-    except:
-        pass
+    # 근로시간 집계 (세션 종료 시 증분 반영, 주 52시간 관리용)
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS daily_hours (
+        user_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        minutes INTEGER NOT NULL DEFAULT 0,
+        tenant_id INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (user_id, date)
+    )''')
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS weekly_hours (
+        user_id INTEGER NOT NULL,
+        week_start TEXT NOT NULL,
+        minutes INTEGER NOT NULL DEFAULT 0,
+        tenant_id INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (user_id, week_start)
+    )''')
     
-    # 기본 관리자 계정 생성 (팀 없음)
-    admin_password = hashlib.sha256("123456".encode()).hexdigest()
-    try:
+    # 변경 이력 (급여/인사 시스템 증분 동기화용, id가 커서)
+    if DATABASE_URL:
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS change_log (
+            id BIGSERIAL PRIMARY KEY,
+            entity TEXT NOT NULL,
+            op TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            tenant_id INTEGER NOT NULL DEFAULT 1
+        )''')
+    else:
+        # AUTOINCREMENT: 오래된 이력을 지워도 id를 재사용하지 않음
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            op TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            tenant_id INTEGER NOT NULL DEFAULT 1
+        )''')
+    
+    # 멀티 테넌트 이전: 기존 데이터는 모두 기본 회사(1) 소속
+    db_execute(c, "INSERT INTO tenant (code, name) VALUES (?, ?) ON CONFLICT DO NOTHING", ("default", "기본 회사"))
+    for table in TENANT_TABLES:
         if DATABASE_URL:
-            db_execute(c, f'''
-                INSERT INTO "user" (name, email, password, team_id, role) 
-                VALUES ({ph}, {ph}, {ph}, NULL, 'admin')
-            ''', ('관리자', 'admin@jbuh.kr', admin_password))
+            db_execute(c, f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS tenant_id INTEGER NOT NULL DEFAULT 1')
         else:
-            db_execute(c, f'''
-                INSERT OR IGNORE INTO user (name, email, password, team_id, role) 
-                VALUES ({ph}, {ph}, {ph}, NULL, 'admin')
-            ''', ('관리자', 'admin@jbuh.kr', admin_password))
-    except:
-        pass
+            db_execute(c, f'PRAGMA table_info("{table}")')
+            if "tenant_id" not in [row["name"] for row in c.fetchall()]:
+                db_execute(c, f'ALTER TABLE "{table}" ADD COLUMN tenant_id INTEGER NOT NULL DEFAULT 1')
+    db_execute(c, "CREATE UNIQUE INDEX IF NOT EXISTS idx_team_tenant_name ON team(tenant_id, name)")
+    
+    # 테넌트 단위 조회용 인덱스 (테넌트 구분 없던 인덱스는 교체)
+    for old_index in ("idx_user_role_name", "idx_daily_hours_date", "idx_weekly_hours_week", "idx_user_tenant_role_name"):
+        db_execute(c, f"DROP INDEX IF EXISTS {old_index}")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_daily_hours_tenant_date ON daily_hours(tenant_id, date)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_weekly_hours_tenant_week ON weekly_hours(tenant_id, week_start)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_change_log_tenant ON change_log(tenant_id, id)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_change_log_created ON change_log(created_at)")
+    
+    # 목록 API 키셋 페이지네이션용 인덱스 (leave는 UNIQUE(user_id, date) 사용)
+    # 직원 목록 정렬(role DESC, name, id)과 방향까지 같아야 정렬 없이 인덱스 순서대로 읽음
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_user_tenant_role_desc_name ON user(tenant_id, role DESC, name, id)")
+    
+    # 출퇴근 조회용 인덱스 (진행 중인 세션은 부분 인덱스로 따로)
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_attendance_user_date ON attendance(user_id, date)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_attendance_tenant_date ON attendance(tenant_id, date)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_attendance_open ON attendance(date) WHERE clock_out IS NULL")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_leave_tenant_date ON leave(tenant_id, date)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_schedule_tenant_date ON schedule(tenant_id, date)")
+    
+    # 집계 테이블이 비어 있으면 (업그레이드 직후) 기존 기록으로 한 번 채움
+    db_execute(c, "SELECT COUNT(*) AS cnt FROM daily_hours")
+    if c.fetchone()["cnt"] == 0:
+        for tenant_id in tenant_ids(c):
+            rebuilder = WorkHoursRebuilder(conn, tenant_id)
+            for user_id, day, minutes in iter_daily_minutes(conn, tenant_id):
+                rebuilder.add(user_id, day, minutes)
+            rebuilder.finish()
+    
+    # 연차 원장과 사용자/연도별 잔액 캐시
+    if DATABASE_URL:
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS leave_ledger (
+            id BIGSERIAL PRIMARY KEY,
+            tenant_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            days REAL NOT NULL,
+            leave_id INTEGER,
+            created_at TEXT NOT NULL
+        )''')
+    else:
+        db_execute(c, '''CREATE TABLE IF NOT EXISTS leave_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            days REAL NOT NULL,
+            leave_id INTEGER,
+            created_at TEXT NOT NULL
+        )''')
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS leave_balance (
+        tenant_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        granted REAL NOT NULL DEFAULT 0,
+        used REAL NOT NULL DEFAULT 0,
+        expired REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, year)
+    )''')
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_leave_ledger_user_year ON leave_ledger(user_id, year)")
+    db_execute(c, "CREATE INDEX IF NOT EXISTS idx_leave_balance_tenant_year ON leave_balance(tenant_id, year)")
+    
+    # 무효화된 토큰 (jti가 '*'이면 revoked_at 이전에 발급된 사용자 토큰 전체, 만료 후 삭제)
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS token_revocation (
+        user_id INTEGER NOT NULL,
+        jti TEXT NOT NULL,
+        revoked_at DOUBLE PRECISION NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (user_id, jti)
+    )''')
+    
+    # 근무일 달력 (공휴일은 미리 계산해 저장, 회사 휴무일은 관리자가 등록)
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS calendar_day (
+        date TEXT PRIMARY KEY,
+        is_workday INTEGER NOT NULL,
+        holiday TEXT
+    )''')
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS company_holiday (
+        tenant_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (tenant_id, date)
+    )''')
+    sync_calendar(c)
+    
+    # 백그라운드 작업 마지막 실행일 (리더가 바뀌어도 하루 한 번만 실행)
+    db_execute(c, '''CREATE TABLE IF NOT EXISTS job_run (
+        name TEXT PRIMARY KEY,
+        last_run TEXT NOT NULL
+    )''')
+    
+    # 기본 회사: 기본 팀 + 관리자 계정 (KDF가 비싸므로 관리자 계정이 없을 때만 해싱)
+    db_execute(c, "SELECT 1 FROM user WHERE email = ?", ("admin@jbuh.kr",))
+    seed_password = None if c.fetchone() else kdf_hash("123456")
+    seed_tenant(c, DEFAULT_TENANT_ID, "관리자", "admin@jbuh.kr", seed_password)
+    
+    # 원장이 비어 있으면 (업그레이드 직후) 올해 연차 부여 + 올해 이후 휴가 사용을 원장으로 옮김
+    # (이전 연도 사용분은 annual_leave_used에만 남고 원장에는 넣지 않음)
+    db_execute(c, "SELECT COUNT(*) AS cnt FROM leave_ledger")
+    if c.fetchone()["cnt"] == 0:
+        year = get_kst_today().year
+        now = get_kst_now().strftime("%Y-%m-%d %H:%M:%S")
+        leave_year = "CAST(substr(l.date, 1, 4) AS INTEGER)"
+        db_execute(c, f"""
+            INSERT INTO leave_ledger (tenant_id, user_id, year, kind, days, leave_id, created_at)
+            SELECT u.tenant_id, u.id, y.year, 'grant', u.annual_leave_total, NULL, ?
+            FROM user u JOIN (
+                SELECT id AS user_id, CAST(? AS INTEGER) AS year FROM user
+                UNION SELECT l.user_id, {leave_year} FROM leave l WHERE l.date >= ?
+            ) y ON y.user_id = u.id
+        """, (now, year, f"{year}-01-01"))
+        db_execute(c, f"""
+            INSERT INTO leave_ledger (tenant_id, user_id, year, kind, days, leave_id, created_at)
+            SELECT l.tenant_id, l.user_id, {leave_year}, 'use',
+                   (CASE WHEN l.type = 'annual' THEN -1.0 ELSE -0.5 END), l.id, ?
+            FROM leave l WHERE l.date >= ?
+        """, (now, f"{year}-01-01"))
+        recompute_leave_balances(c, year)
     
     # 기존 관리자 팀 NULL로 업데이트
     try:
@@ -233,7 +1072,10 @@ def init_db():
     conn.commit()
     return conn
 
-init_db()
+# `python main.py`로 실행하면 spawn 방식 KDF 워커가 이 파일을 __mp_main__으로 다시 import하므로
+# 워커에서는 DB 초기화/시드를 하지 않음
+if __name__ != "__mp_main__":
+    init_db()
 
 # ==================== Pydantic 모델 ====================
 class UserRegister(BaseModel):
@@ -241,6 +1083,7 @@ class UserRegister(BaseModel):
     email: str
     password: str
     team_id: int = 1
+    tenant: Optional[str] = None  # 회사 코드 (없으면 기본 회사)
 
 class UserLogin(BaseModel):
     email: str
@@ -260,6 +1103,21 @@ class ScheduleUpdate(BaseModel):
     planned_in: str
     planned_out: str
 
+class SchedulePattern(BaseModel):
+    weekdays: List[int] = [0, 1, 2, 3, 4]  # 0=월 ... 6=일
+    planned_in: str
+    planned_out: str
+
+class ScheduleBulk(BaseModel):
+    team_id: Optional[int] = None      # 팀 전체 (관리자 제외)
+    user_ids: List[int] = []
+    date_from: str
+    date_to: str
+    patterns: List[SchedulePattern]    # 같은 요일이 겹치면 뒤의 패턴이 우선
+    skip_holidays: bool = True         # 공휴일/회사 휴무일은 건너뜀
+    overwrite: bool = True             # 기존 일정과 다르면 덮어씀 (False면 기존 일정 유지)
+    dry_run: bool = False              # 저장하지 않고 결과만 확인
+
 class LeaveRequest(BaseModel):
     user_id: int
     date: str
@@ -276,8 +1134,11 @@ class AnnualLeaveUpdate(BaseModel):
     annual_leave_total: float
 
 # ==================== 유틸리티 ====================
+# KDF는 프로세스 풀에서 실행 (HASH_WORKERS로 프로세스 수 조절)
+password_hasher = PasswordHasher(max_workers=int(os.environ.get("HASH_WORKERS", 0)) or None)
+
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    return password_hasher.hash(password)
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """두 좌표 간 거리 계산 (미터)"""
@@ -292,26 +1153,338 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return R * c
 
-def get_week_dates(target_date=None):
-    """해당 주의 월~금 날짜 리스트 반환"""
+# --- 목록 API 페이지네이션 ---
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values, signed=True) -> str:
+    """마지막 행의 정렬 키를 불투명한 커서 문자열로
+
+    signed: 서버가 발급한 커서인지 서명으로 확인 (페이지 커서는 요청 속도 제한 면제에 쓰이므로).
+    외부 시스템이 오래 저장하는 변경 이력 커서는 키가 바뀌어도 이어 받도록 서명하지 않음.
+    """
+    body = _b64encode(json.dumps(values, separators=(",", ":")).encode())
+    return f"{body}.{_sign('cursor:' + body)}" if signed else body
+
+def verify_cursor(cursor: str) -> Optional[str]:
+    """서명된 커서 → 본문 (서명이 맞지 않으면 None)"""
+    body, _, signature = cursor.rpartition(".")
+    if not body or not hmac.compare_digest(signature.encode(), _sign("cursor:" + body).encode()):
+        return None
+    return body
+
+def decode_cursor(cursor: str, types: tuple, signed=True) -> list:
+    """커서 → 정렬 키 값 목록 (types: 키마다 기대하는 타입, 예: (str, int))"""
+    body = verify_cursor(cursor) if signed else cursor
+    try:
+        values = json.loads(_b64decode(body)) if body else None
+    except ValueError:
+        values = None
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(type(v) is t for v, t in zip(values, types))):
+        raise HTTPException(status_code=400, detail="잘못된 cursor 값입니다")
+    return values
+
+def select_fields(fields: Optional[str], columns: dict) -> list:
+    """fields=id,name 형식 파라미터 → 응답에 포함할 필드 목록 (없으면 전체)"""
+    if not fields:
+        return list(columns)
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"알 수 없는 필드: {', '.join(unknown)}")
+    return selected
+
+def clamp_limit(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+def paginate(rows, limit, fields, cursor_keys, response: Response):
+    """limit+1개 조회한 결과 → 한 페이지, 다음 페이지가 있으면 X-Next-Cursor 헤더"""
+    page = rows[:limit]
+    if len(rows) > limit:
+        last = page[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last[k] for k in cursor_keys])
+    return [{f: row[f] for f in fields} for row in page]
+
+# --- 대용량 응답 ---
+class ColumnarPayload(BaseModel):
+    """format=columnar 응답: 필드별 값 배열"""
+    count: int
+    columns: dict
+
+def rows_response(rows: list, fields: list, format: str = "rows", response: Response = None):
+    """검증/jsonable_encoder를 거치지 않고 바로 orjson으로 응답
+
+    format=columnar면 {"count": n, "columns": {필드: [값, ...]}} (키 반복이 없어 훨씬 작음)
+    """
+    if format == "columnar":
+        content = {"count": len(rows), "columns": {f: [row[f] for row in rows] for f in fields}}
+    elif format == "rows":
+        content = rows
+    else:
+        raise HTTPException(status_code=400, detail="format은 rows 또는 columnar만 가능합니다")
+    headers = None
+    if response is not None and "x-next-cursor" in response.headers:
+        headers = {"X-Next-Cursor": response.headers["x-next-cursor"]}
+    return FastJSONResponse(content, headers=headers)
+
+def get_week_range(target_date=None):
+    """해당 주의 (월요일, 일요일)"""
     if target_date is None:
         target_date = get_kst_today()
     
     # 월요일 찾기
     monday = target_date - timedelta(days=target_date.weekday())
-    return [(monday + timedelta(days=i)).isoformat() for i in range(5)]
+    return monday.isoformat(), (monday + timedelta(days=6)).isoformat()
+
+# ==================== 인증 토큰 ====================
+# 서명된 토큰 (HMAC-SHA256) - DB 조회 없이 메모리에서 검증
+# SECRET_KEY 미설정 시 프로세스마다 새 키 → 재시작/멀티 워커에서 토큰 무효
+SECRET_KEY = (os.environ.get("SECRET_KEY") or secrets.token_hex(32)).encode()
+ACCESS_TOKEN_TTL = int(os.environ.get("ACCESS_TOKEN_TTL", 12 * 3600))  # 초
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(SECRET_KEY, body.encode(), hashlib.sha256).digest())
+
+# 다른 워커에서 무효화한 토큰이 이 워커에 반영되기까지 최대 지연 (초)
+TOKEN_REVOCATION_TTL = int(os.environ.get("TOKEN_REVOCATION_TTL", 5))
+ALL_TOKENS = "*"  # token_revocation.jti: 이 시각 이전에 발급된 사용자 토큰 전체
+
+class TokenRevocations:
+    """로그아웃/권한 변경으로 무효화된 토큰 (token_revocation 테이블 + 워커 메모리 캐시)
+
+    - jti 단위: 로그아웃한 토큰 (만료 시각까지만 보관)
+    - 사용자 단위: 이 시각 이전에 발급된 토큰 전체 무효 (권한 변경, 비밀번호 초기화)
+    사용자별로 TOKEN_REVOCATION_TTL 동안 캐시 (이 워커에서 무효화하면 바로 반영,
+    다른 워커나 재시작 후에도 DB 기준으로 유지)
+    """
+    MAX_USERS = 100000
+
+    def __init__(self):
+        self._users = {}        # user_id -> (조회 시각, 전체 무효 시각, 로그아웃한 jti 집합)
+        self._lock = threading.Lock()
+
+    def revoke_token(self, c, user_id, jti, exp):
+        """로그아웃 (커밋은 호출한 쪽에서)"""
+        db_execute(c, """
+            INSERT INTO token_revocation (user_id, jti, revoked_at, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, jti) DO NOTHING
+        """, (user_id, jti, time.time(), exp))
+        revoked_before, jtis = self._revocations(user_id)
+        self._remember(user_id, revoked_before, jtis | {jti})
+
+    def revoke_user(self, c, user_id):
+        """지금까지 발급된 사용자 토큰 전체 무효 (커밋은 호출한 쪽에서)"""
+        now = time.time()
+        db_execute(c, """
+            INSERT INTO token_revocation (user_id, jti, revoked_at, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, jti) DO UPDATE SET
+            revoked_at = excluded.revoked_at, expires_at = excluded.expires_at
+        """, (user_id, ALL_TOKENS, now, now + ACCESS_TOKEN_TTL))
+        self._remember(user_id, now, self._revocations(user_id)[1])
+
+    def is_revoked(self, payload) -> bool:
+        revoked_before, jtis = self._revocations(payload["sub"])
+        if payload["jti"] in jtis:
+            return True
+        return revoked_before is not None and payload["iat"] <= revoked_before
+
+    def _revocations(self, user_id):
+        cached = self._users.get(user_id)
+        if cached and time.time() - cached[0] < TOKEN_REVOCATION_TTL:
+            return cached[1], cached[2]
+        # 방금 무효화한 토큰도 보이도록 primary에서 조회
+        fetched = time.time()
+        conn = get_db()
+        c = conn.cursor()
+        db_execute(c, "SELECT jti, revoked_at FROM token_revocation WHERE user_id = ? AND expires_at > ?",
+                   (user_id, fetched))
+        revoked_before, jtis = None, set()
+        for row in c.fetchall():
+            if row["jti"] == ALL_TOKENS:
+                revoked_before = row["revoked_at"]
+            else:
+                jtis.add(row["jti"])
+        self._remember(user_id, revoked_before, jtis, fetched)
+        return revoked_before, jtis
+
+    def _remember(self, user_id, revoked_before, jtis, fetched=None):
+        # 이 워커에서 무효화한 것은 커밋 전에도 바로 반영 (다른 워커는 TTL 후 DB에서 읽음)
+        with self._lock:
+            if len(self._users) >= self.MAX_USERS:
+                self._users = {}
+            self._users[user_id] = (fetched or time.time(), revoked_before, jtis)
+
+token_revocations = TokenRevocations()
+
+def create_access_token(user) -> str:
+    now = time.time()
+    payload = {
+        "sub": user["id"],
+        "role": user["role"],
+        "team_id": user["team_id"],
+        "tid": user["tenant_id"],
+        "iat": now,
+        "exp": now + ACCESS_TOKEN_TTL,
+        "jti": secrets.token_hex(8)
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}"
+
+def decode_access_token(token: str, check_revoked=True):
+    """유효하면 payload, 아니면 None
+
+    check_revoked=False: 무효화 여부는 보지 않음 (이벤트 루프에서 DB를 조회하지 않도록 미들웨어에서 사용)
+    """
+    try:
+        body, signature = token.split(".")
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(body)):
+        return None
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if payload["exp"] < time.time() or (check_revoked and token_revocations.is_revoked(payload)):
+        return None
+    # 멀티 테넌트 이전에 발급된 토큰은 기본 회사
+    payload.setdefault("tid", DEFAULT_TENANT_ID)
+    return payload
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    """Authorization: Bearer <token> 헤더에서 사용자 정보 (sub, role, team_id, tid)"""
+    payload = decode_access_token(credentials.credentials) if credentials else None
+    if not payload:
+        raise HTTPException(
+            status_code=401, detail="로그인이 필요합니다",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return payload
+
+def require_admin(current=Depends(get_current_user)):
+    if current["role"] != "admin":
+        raise HTTPException(status_code=403, detail="관리자만 사용할 수 있습니다")
+    return current
+
+def require_operator(current=Depends(require_admin)):
+    """배포 전체 관리 (회사 추가, 백그라운드 작업, 지표) - 기본 회사 관리자만"""
+    if current["tid"] != DEFAULT_TENANT_ID:
+        raise HTTPException(status_code=403, detail="관리자만 사용할 수 있습니다")
+    return current
+
+def get_request_tenant(tenant: Optional[str] = None,
+                       credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> int:
+    """로그인 전에도 쓰는 API용 회사 id (토큰이 있으면 토큰의 회사, 없으면 tenant 코드, 둘 다 없으면 기본 회사)"""
+    payload = decode_access_token(credentials.credentials) if credentials else None
+    if payload:
+        return payload["tid"]
+    return tenant_cache.resolve(tenant) if tenant else DEFAULT_TENANT_ID
+
+def check_user_access(current, user_id: int):
+    """본인 또는 같은 회사 관리자만 허용"""
+    if current["sub"] == user_id:
+        return
+    if current["role"] != "admin" or tenant_cache.tenant_of_user(user_id) != current["tid"]:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+
+def check_team_access(c, current, user_id: int):
+    """본인, 같은 회사 관리자, 같은 팀원만 허용"""
+    if current["sub"] == user_id:
+        return
+    if current["role"] == "admin":
+        return check_user_access(current, user_id)
+    db_execute(c, "SELECT team_id FROM user WHERE id = ?", (user_id,))
+    row = c.fetchone()
+    if not row or row["team_id"] is None or row["team_id"] != current["team_id"]:
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+
+# ==================== 요청 수용 제어 ====================
+CRITICAL_PATHS = {"/api/attendance/clock-in", "/api/attendance/clock-out"}
+# 전 직원/장기간을 훑는 관리자 리포트
+# (팀 캘린더는 팀원도 매일 여는 화면이라 normal - 한 팀 한 달 범위로 제한됨)
+HEAVY_PATH_PREFIXES = (
+    "/api/admin/all-status",
+    "/api/admin/hours",
+    "/api/admin/employees",
+    "/api/admin/compliance",
+    "/api/admin/occupancy",
+    "/api/schedule/bulk",
+)
+
+def classify_request(scope):
+    path = scope["path"]
+    if not path.startswith("/api/") or path == "/api/admin/metrics":
+        return None
+    if path in CRITICAL_PATHS:
+        return CRITICAL
+    if path.startswith(HEAVY_PATH_PREFIXES):
+        return HEAVY
+    return NORMAL
+
+def _scope_token(scope):
+    """요청 헤더의 토큰 payload (미들웨어에서 여러 번 쓰므로 scope에 저장)"""
+    if "flextime.token" not in scope:
+        payload = None
+        for name, value in scope["headers"]:
+            if name == b"authorization" and value[:7].lower() == b"bearer ":
+                payload = decode_access_token(value[7:].decode(), check_revoked=False)
+                break
+        scope["flextime.token"] = payload
+    return scope["flextime.token"]
+
+# 커서로 페이지를 이어 받는 무거운 목록 조회 (다음 페이지는 요청 속도 제한에서 면제)
+PAGINATED_PATHS = {"/api/admin/employees"}
+
+def identify_request(scope):
+    """사용자별 요청 속도 제한 키 (토큰이 없으면 IP)
+
+    페이지 목록의 다음 페이지 요청(서버가 서명한 cursor)은 이미 토큰을 낸 목록 조회의
+    연속이므로 None (토큰 차감 없음)
+    """
+    if scope["path"] in PAGINATED_PATHS:
+        cursor = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("cursor")
+        if cursor and verify_cursor(cursor[0]):
+            return None
+    payload = _scope_token(scope)
+    if payload:
+        return f"user:{payload['sub']}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else ''}"
+
+def tenant_of_request(scope):
+    """회사별 동시 처리 제한 키 (로그인 전 요청은 제한 없음)"""
+    payload = _scope_token(scope)
+    return payload["tid"] if payload else None
+
+@app.get("/api/admin/metrics")
+def get_metrics(current=Depends(require_operator)):
+    """관리자용: 요청 수용 제어 현황 (등급별 처리 중 요청, 대기열 길이, 거절 수)"""
+    return {"admission": admission.snapshot()}
 
 # ==================== API 엔드포인트 ====================
 
 # --- 인증 ---
 @app.post("/api/auth/register")
 def register(user: UserRegister):
+    tenant_id = tenant_cache.resolve(user.tenant) if user.tenant else DEFAULT_TENANT_ID
     conn = get_db()
     c = conn.cursor()
+    db_execute(c, "SELECT id FROM team WHERE id = ? AND tenant_id = ?", (user.team_id, tenant_id))
+    if not c.fetchone():
+        raise HTTPException(status_code=400, detail="팀을 찾을 수 없습니다")
     try:
         db_execute(c, 
-            "INSERT INTO user (name, email, password, team_id) VALUES (?, ?, ?, ?)",
-            (user.name, user.email, hash_password(user.password), user.team_id)
+            "INSERT INTO user (tenant_id, name, email, password, team_id) VALUES (?, ?, ?, ?, ?)",
+            (tenant_id, user.name, user.email, hash_password(user.password), user.team_id)
         )
         conn.commit()
         user_id = c.lastrowid
@@ -324,17 +1497,25 @@ def login(user: UserLogin):
     conn = get_db()
     c = conn.cursor()
     db_execute(c, 
-        "SELECT id, name, email, team_id, role, annual_leave_total, annual_leave_used FROM user WHERE email = ? AND password = ?",
-        (user.email, hash_password(user.password))
+        f"""SELECT u.id, u.tenant_id, u.name, u.email, u.password, u.team_id, u.role,
+                   {LEAVE_TOTAL_SQL} AS annual_leave_total, {LEAVE_USED_SQL} AS annual_leave_used
+            FROM user u {LEAVE_BALANCE_JOIN} WHERE u.email = ?""",
+        (get_kst_today().year, user.email)
     )
     row = c.fetchone()
-    if row:
+    if row and password_hasher.verify(user.password, row["password"]):
+        # 이전 방식(SHA-256) 해시는 로그인 성공 시 새 KDF로 교체
+        if password_hasher.needs_rehash(row["password"]):
+            db_execute(c, "UPDATE user SET password = ? WHERE id = ?", (hash_password(user.password), row["id"]))
+            conn.commit()
         return {
             "success": True,
+            "token": create_access_token(row),
             "user": {
                 "id": row["id"],
                 "name": row["name"],
                 "email": row["email"],
+                "tenant_id": row["tenant_id"],
                 "team_id": row["team_id"],
                 "role": row["role"],
                 "annual_leave_total": row["annual_leave_total"],
@@ -343,68 +1524,102 @@ def login(user: UserLogin):
         }
     raise HTTPException(status_code=401, detail="이메일 또는 비밀번호가 틀렸습니다")
 
-@app.get("/api/auth/user/{user_id}")
-def get_user(user_id: int):
+@app.post("/api/auth/logout")
+def logout(current=Depends(get_current_user)):
     conn = get_db()
     c = conn.cursor()
-    db_execute(c, 
-        "SELECT u.*, t.name as team_name FROM user u LEFT JOIN team t ON u.team_id = t.id WHERE u.id = ?",
-        (user_id,)
-    )
+    token_revocations.revoke_token(c, current["sub"], current["jti"], current["exp"])
+    conn.commit()
+    return {"success": True}
+
+@app.get("/api/auth/user/{user_id}")
+def get_user(user_id: int, current=Depends(get_current_user)):
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    db_execute(c, f"""
+        SELECT u.*, t.name as team_name, {LEAVE_TOTAL_SQL} AS leave_total, {LEAVE_USED_SQL} AS leave_used
+        FROM user u LEFT JOIN team t ON u.team_id = t.id {LEAVE_BALANCE_JOIN}
+        WHERE u.id = ?
+    """, (get_kst_today().year, user_id))
     row = c.fetchone()
     if row:
-        return dict(row)
+        # 연차는 사용자 컬럼이 아니라 올해 잔액 캐시 기준
+        user = dict(row)
+        user["annual_leave_total"] = user.pop("leave_total")
+        user["annual_leave_used"] = user.pop("leave_used")
+        return user
     raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
 
 # --- 팀 ---
+TEAM_COLUMNS = {"id": "id", "name": "name"}
+
 @app.get("/api/teams")
-def get_teams():
-    conn = get_db()
+def get_teams(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None,
+              fields: Optional[str] = None, tenant_id: int = Depends(get_request_tenant)):
+    """팀 목록 (id 순, 다음 페이지는 X-Next-Cursor 헤더의 cursor로 조회)
+
+    회원가입 화면에서는 로그인 전이므로 tenant=<회사 코드>로 회사를 지정
+    """
+    conn = get_db(readonly=True)
     c = conn.cursor()
-    db_execute(c, "SELECT * FROM team")
-    return [dict(row) for row in c.fetchall()]
+    limit = clamp_limit(limit)
+    selected = select_fields(fields, TEAM_COLUMNS)
+    
+    where, params = "WHERE tenant_id = ?", [tenant_id]
+    if cursor:
+        (last_id,) = decode_cursor(cursor, (int,))
+        where += " AND id > ?"
+        params.append(last_id)
+    
+    db_execute(c, f"SELECT id, name FROM team {where} ORDER BY id LIMIT ?", params + [limit + 1])
+    return paginate(c.fetchall(), limit, selected, ["id"], response)
 
 class TeamCreate(BaseModel):
     name: str
 
 @app.post("/api/teams")
-def create_team(data: TeamCreate):
+def create_team(data: TeamCreate, current=Depends(require_admin)):
     conn = get_db()
     c = conn.cursor()
     try:
-        db_execute(c, "INSERT INTO team (name) VALUES (?)", (data.name,))
+        db_execute(c, "INSERT INTO team (tenant_id, name) VALUES (?, ?)", (current["tid"], data.name))
         conn.commit()
+        replica_router.mark_write()
         return {"success": True, "id": c.lastrowid}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="이미 존재하는 팀 이름입니다")
 
 @app.delete("/api/teams/{team_id}")
-def delete_team(team_id: int):
+def delete_team(team_id: int, current=Depends(require_admin)):
     conn = get_db()
     c = conn.cursor()
     # 팀에 소속된 직원이 있는지 확인
-    db_execute(c, "SELECT COUNT(*) as cnt FROM user WHERE team_id = ?", (team_id,))
+    db_execute(c, "SELECT COUNT(*) as cnt FROM user WHERE team_id = ? AND tenant_id = ?", (team_id, current["tid"]))
     count = c.fetchone()["cnt"]
     if count > 0:
         raise HTTPException(status_code=400, detail=f"이 팀에 {count}명의 직원이 있어 삭제할 수 없습니다")
     
-    db_execute(c, "DELETE FROM team WHERE id = ?", (team_id,))
+    db_execute(c, "DELETE FROM team WHERE id = ? AND tenant_id = ?", (team_id, current["tid"]))
     conn.commit()
+    replica_router.mark_write()
     return {"success": True}
 
 # --- 출퇴근 ---
 @app.post("/api/attendance/clock-in")
-def clock_in(data: ClockIn):
+def clock_in(data: ClockIn, current=Depends(get_current_user)):
+    check_user_access(current, data.user_id)
+    settings = tenant_cache.settings(current["tid"])
     # GPS 거리 확인
     distance = calculate_distance(
         data.latitude, data.longitude,
-        COMPANY_SETTINGS["latitude"], COMPANY_SETTINGS["longitude"]
+        settings["latitude"], settings["longitude"]
     )
     
-    if distance > COMPANY_SETTINGS["radius_meters"]:
+    if distance > settings["radius_meters"]:
         raise HTTPException(
             status_code=400, 
-            detail=f"회사에서 너무 멀어요! (현재 거리: {int(distance)}m, 허용: {COMPANY_SETTINGS['radius_meters']}m)"
+            detail=f"회사에서 너무 멀어요! (현재 거리: {int(distance)}m, 허용: {settings['radius_meters']}m)"
         )
     
     conn = get_db()
@@ -424,14 +1639,21 @@ def clock_in(data: ClockIn):
     
     # 새로운 출근 기록 생성 (하루에 여러 번 가능)
     db_execute(c, 
-        "INSERT INTO attendance (user_id, date, clock_in) VALUES (?, ?, ?)",
-        (data.user_id, today, now)
+        "INSERT INTO attendance (tenant_id, user_id, date, clock_in) VALUES (?, ?, ?, ?) RETURNING id",
+        (current["tid"], data.user_id, today, now)
     )
+    attendance_id = c.fetchone()["id"]
+    record_change(c, current["tid"], "attendance", "create", attendance_id, data.user_id, {
+        "id": attendance_id, "user_id": data.user_id, "date": today,
+        "clock_in": now, "clock_out": None, "work_minutes": 0
+    })
     conn.commit()
+    replica_router.mark_write()
     return {"success": True, "clock_in": now, "message": "출근 완료!"}
 
 @app.post("/api/attendance/clock-out")
-def clock_out(data: ClockOut):
+def clock_out(data: ClockOut, current=Depends(get_current_user)):
+    check_user_access(current, data.user_id)
     conn = get_db()
     c = conn.cursor()
     today = get_kst_today().isoformat()
@@ -439,7 +1661,7 @@ def clock_out(data: ClockOut):
     
     # 오늘 퇴근 안 한 가장 최근 출근 기록 찾기
     db_execute(c, 
-        "SELECT id, clock_in FROM attendance WHERE user_id = ? AND date = ? AND clock_out IS NULL ORDER BY id DESC LIMIT 1",
+        "SELECT id, user_id, date, clock_in FROM attendance WHERE user_id = ? AND date = ? AND clock_out IS NULL ORDER BY id DESC LIMIT 1",
         (data.user_id, today)
     )
     row = c.fetchone()
@@ -456,7 +1678,11 @@ def clock_out(data: ClockOut):
         "UPDATE attendance SET clock_out = ?, work_minutes = ? WHERE id = ?",
         (now, work_minutes, row["id"])
     )
+    record_work_minutes(c, current["tid"], data.user_id, today, work_minutes)
+    record_change(c, current["tid"], "attendance", "update", row["id"], data.user_id,
+                  {**dict(row), "clock_out": now, "work_minutes": work_minutes})
     conn.commit()
+    replica_router.mark_write()
     
     hours = work_minutes // 60
     mins = work_minutes % 60
@@ -468,9 +1694,10 @@ def clock_out(data: ClockOut):
     }
 
 @app.get("/api/attendance/today/{user_id}")
-def get_today_attendance(user_id: int):
+def get_today_attendance(user_id: int, current=Depends(get_current_user)):
+    check_user_access(current, user_id)
     try:
-        conn = get_db()
+        conn = get_db(readonly=True)
         c = conn.cursor()
         today = get_kst_today().isoformat()
         
@@ -529,17 +1756,20 @@ def get_today_attendance(user_id: int):
         return {"date": "", "clock_in": None, "clock_out": None, "work_minutes": 0, "sessions": [], "is_working": False, "error": str(e)}
 
 @app.get("/api/attendance/weekly/{user_id}")
-def get_weekly_attendance(user_id: int):
-    conn = get_db()
+def get_weekly_attendance(user_id: int, current=Depends(get_current_user)):
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
     c = conn.cursor()
-    week_dates = get_week_dates()
+    week_start, week_end = get_week_range()
+    week_dates = work_calendar.work_days(current["tid"], week_start, week_end)
     
     # 각 날짜별 총 근무시간 계산
     db_execute(c, 
-        f"SELECT date, SUM(work_minutes) as total_minutes FROM attendance WHERE user_id = ? AND date IN ({','.join(['?']*5)}) GROUP BY date",
-        [user_id] + week_dates
+        "SELECT date, SUM(work_minutes) as total_minutes FROM attendance WHERE user_id = ? AND date BETWEEN ? AND ? GROUP BY date",
+        (user_id, week_start, week_end)
     )
     records = {row["date"]: row["total_minutes"] or 0 for row in c.fetchall()}
+    settings = tenant_cache.settings(current["tid"])
     
     # 오늘 현재 근무중인 세션 확인
     today = get_kst_today().isoformat()
@@ -551,15 +1781,17 @@ def get_weekly_attendance(user_id: int):
     
     # 휴가 정보도 가져오기
     db_execute(c, 
-        f"SELECT * FROM leave WHERE user_id = ? AND date IN ({','.join(['?']*5)})",
-        [user_id] + week_dates
+        "SELECT * FROM leave WHERE user_id = ? AND date BETWEEN ? AND ?",
+        (user_id, week_start, week_end)
     )
     leaves = {row["date"]: dict(row) for row in c.fetchall()}
     
     total_minutes = 0
     daily = []
+    target = target_minutes(settings, len(week_dates))
     
-    for d in week_dates:
+    # 근무일 + 쉬는 날에 일한 날
+    for d in sorted(set(week_dates) | {d for d, m in records.items() if m} | ({today} if working_session else set())):
         minutes = records.get(d, 0)
         
         # 오늘이고 근무중이면 현재까지 시간 추가
@@ -575,66 +1807,80 @@ def get_weekly_attendance(user_id: int):
         if d in leaves:
             leave_text = {"annual": "연차", "half_am": "오전반차", "half_pm": "오후반차"}.get(leaves[d]["type"])
         
-        daily.append({"date": d, "minutes": minutes, "leave": leave_text})
+        daily.append({"date": d, "minutes": minutes, "leave": leave_text,
+                      "holiday": work_calendar.day_off(current["tid"], d)})
     
     return {
         "total_minutes": total_minutes,
         "total_hours": round(total_minutes / 60, 1),
-        "target_hours": COMPANY_SETTINGS["weekly_hours"],
-        "progress_percent": min(100, round(total_minutes / 60 / COMPANY_SETTINGS["weekly_hours"] * 100)),
+        "target_hours": round(target / 60, 1),
+        "progress_percent": min(100, round(total_minutes / target * 100)) if target else 100,
         "daily": daily
     }
 
 @app.put("/api/attendance/update")
-def update_attendance(data: AttendanceUpdate):
+def update_attendance(data: AttendanceUpdate, current=Depends(get_current_user)):
+    check_user_access(current, data.user_id)
     conn = get_db()
     c = conn.cursor()
     
     # 기존 기록 확인
     db_execute(c, 
-        "SELECT id, clock_in, clock_out FROM attendance WHERE user_id = ? AND date = ?",
+        "SELECT id, clock_in, clock_out, work_minutes FROM attendance WHERE user_id = ? AND date = ?",
         (data.user_id, data.date)
     )
     row = c.fetchone()
     
+    new_clock_in = data.clock_in if data.clock_in else (row["clock_in"] if row else None)
+    new_clock_out = data.clock_out if data.clock_out else (row["clock_out"] if row else None)
+    
+    # 근무시간 재계산
+    work_minutes = 0
+    if new_clock_in and new_clock_out:
+        in_time = datetime.strptime(new_clock_in, "%H:%M")
+        out_time = datetime.strptime(new_clock_out, "%H:%M")
+        work_minutes = int((out_time - in_time).total_seconds() / 60)
+    
     if not row:
         # 기록이 없으면 새로 생성
         db_execute(c, 
-            "INSERT INTO attendance (user_id, date, clock_in, clock_out) VALUES (?, ?, ?, ?)",
-            (data.user_id, data.date, data.clock_in, data.clock_out)
+            "INSERT INTO attendance (tenant_id, user_id, date, clock_in, clock_out, work_minutes) VALUES (?, ?, ?, ?, ?, ?) RETURNING id",
+            (current["tid"], data.user_id, data.date, new_clock_in, new_clock_out, work_minutes)
         )
+        attendance_id, op = c.fetchone()["id"], "create"
+        record_work_minutes(c, current["tid"], data.user_id, data.date, work_minutes)
     else:
         # 기존 기록 업데이트
-        new_clock_in = data.clock_in if data.clock_in else row["clock_in"]
-        new_clock_out = data.clock_out if data.clock_out else row["clock_out"]
-        
-        # 근무시간 재계산
-        work_minutes = 0
-        if new_clock_in and new_clock_out:
-            in_time = datetime.strptime(new_clock_in, "%H:%M")
-            out_time = datetime.strptime(new_clock_out, "%H:%M")
-            work_minutes = int((out_time - in_time).total_seconds() / 60)
-        
         db_execute(c, 
             "UPDATE attendance SET clock_in = ?, clock_out = ?, work_minutes = ? WHERE id = ?",
             (new_clock_in, new_clock_out, work_minutes, row["id"])
         )
+        attendance_id, op = row["id"], "update"
+        record_work_minutes(c, current["tid"], data.user_id, data.date, work_minutes - (row["work_minutes"] or 0))
     
+    record_change(c, current["tid"], "attendance", op, attendance_id, data.user_id, {
+        "id": attendance_id, "user_id": data.user_id, "date": data.date,
+        "clock_in": new_clock_in, "clock_out": new_clock_out, "work_minutes": work_minutes
+    })
     conn.commit()
+    replica_router.mark_write()
     return {"success": True, "message": "수정 완료!"}
 
 # --- 일정 ---
 @app.get("/api/schedule/week/{user_id}")
-def get_week_schedule(user_id: int):
-    conn = get_db()
+def get_week_schedule(user_id: int, current=Depends(get_current_user)):
+    conn = get_db(readonly=True)
     c = conn.cursor()
-    week_dates = get_week_dates()
+    check_team_access(c, current, user_id)
+    week_start, week_end = get_week_range()
+    week_dates = work_calendar.work_days(current["tid"], week_start, week_end)
     
     db_execute(c, 
-        f"SELECT * FROM schedule WHERE user_id = ? AND date IN ({','.join(['?']*5)})",
-        [user_id] + week_dates
+        "SELECT * FROM schedule WHERE user_id = ? AND date BETWEEN ? AND ?",
+        (user_id, week_start, week_end)
     )
     records = {row["date"]: dict(row) for row in c.fetchall()}
+    settings = tenant_cache.settings(current["tid"])
     
     result = []
     for d in week_dates:
@@ -643,32 +1889,225 @@ def get_week_schedule(user_id: int):
         else:
             result.append({
                 "date": d,
-                "planned_in": COMPANY_SETTINGS["default_in"],
-                "planned_out": COMPANY_SETTINGS["default_out"]
+                "planned_in": settings["default_in"],
+                "planned_out": settings["default_out"]
             })
     
     return result
 
 @app.put("/api/schedule/update")
-def update_schedule(data: ScheduleUpdate):
+def update_schedule(data: ScheduleUpdate, current=Depends(get_current_user)):
+    check_user_access(current, data.user_id)
     conn = get_db()
     c = conn.cursor()
     
     db_execute(c, 
-        """INSERT INTO schedule (user_id, date, planned_in, planned_out) 
-           VALUES (?, ?, ?, ?)
+        """INSERT INTO schedule (tenant_id, user_id, date, planned_in, planned_out) 
+           VALUES (?, ?, ?, ?, ?)
            ON CONFLICT(user_id, date) DO UPDATE SET 
            planned_in = excluded.planned_in, planned_out = excluded.planned_out""",
-        (data.user_id, data.date, data.planned_in, data.planned_out)
+        (current["tid"], data.user_id, data.date, data.planned_in, data.planned_out)
     )
     conn.commit()
+    replica_router.mark_write()
     return {"success": True}
 
-# --- 팀 현황 ---
-@app.get("/api/team/status/{team_id}")
-def get_team_status(team_id: int, date: str = None):
-    conn = get_db()
-    c = conn.cursor()
+# 한 번에 계획할 수 있는 범위 (요청 하나가 트랜잭션을 오래 잡지 않도록)
+MAX_BULK_SCHEDULE_DAYS = 366
+MAX_BULK_SCHEDULE_ROWS = 50000
+BULK_CONFLICT_SAMPLE = 100  # 응답에 담는 충돌 내역 최대 건수 (종류별, 나머지는 건수만)
+
+def parse_date_range(date_from: str, date_to: str, max_days: int):
+    """(date_from, date_to) 검증 후 ISO 문자열로 반환"""
+    start_day, end_day = parse_calendar_date(date_from, "date_from"), parse_calendar_date(date_to, "date_to")
+    if end_day < start_day or (end_day - start_day).days >= max_days:
+        raise HTTPException(status_code=400, detail=f"기간은 {max_days}일 이내여야 합니다")
+    return start_day.isoformat(), end_day.isoformat()
+
+def resolve_schedule_users(c, current, team_id, user_ids, write: bool) -> list:
+    """일정 대상 직원 id 목록 (팀 전체 + 지정한 직원)
+
+    쓰기는 본인/같은 회사 관리자만, 읽기는 같은 팀원까지 허용
+    """
+    if team_id is None and not user_ids:
+        raise HTTPException(status_code=400, detail="team_id 또는 user_ids가 필요합니다")
+    selected = set()
+    if team_id is not None:
+        if current["role"] != "admin" and (write or current["team_id"] != team_id):
+            raise HTTPException(status_code=403, detail="권한이 없습니다")
+        db_execute(c, 
+            "SELECT id FROM user WHERE tenant_id = ? AND team_id = ? AND role != 'admin'",
+            (current["tid"], team_id)
+        )
+        selected.update(row["id"] for row in c.fetchall())
+    for user_id in set(user_ids) - selected:
+        if write:
+            check_user_access(current, user_id)
+        else:
+            check_team_access(c, current, user_id)
+        selected.add(user_id)
+    return sorted(selected)
+
+@app.post("/api/schedule/bulk")
+def bulk_schedule(data: ScheduleBulk, current=Depends(get_current_user)):
+    """팀/여러 직원의 기간 일정을 반복 패턴으로 한 번에 계획
+
+    패턴을 서버에서 날짜별로 펼친 뒤 기존 일정/휴가와 비교해 바뀌는 행만
+    한 트랜잭션 안에서 여러 행 upsert로 저장하고, 충돌 내역을 돌려줌.
+    충돌은 종류별로 {count, sample(앞 BULK_CONFLICT_SAMPLE건), truncated}.
+    - leave: 휴가가 있는 날 (일정을 쓰지 않음)
+    - changed: 기존 일정과 다른 날 (overwrite=False면 기존 일정 유지)
+    - holidays: 패턴에 해당하지만 공휴일/회사 휴무일이라 건너뛴 날
+    """
+    date_from, date_to = parse_date_range(data.date_from, data.date_to, MAX_BULK_SCHEDULE_DAYS)
+    if not data.patterns:
+        raise HTTPException(status_code=400, detail="patterns가 비어 있습니다")
+    by_weekday = {}
+    for pattern in data.patterns:
+        try:
+            if datetime.strptime(pattern.planned_in, "%H:%M") >= datetime.strptime(pattern.planned_out, "%H:%M"):
+                raise ValueError
+        except ValueError:
+            raise HTTPException(status_code=400, detail="일정 시간은 HH:MM이고 출근이 퇴근보다 빨라야 합니다")
+        for weekday in pattern.weekdays:
+            if not 0 <= weekday <= 6:
+                raise HTTPException(status_code=400, detail="weekdays는 0(월)~6(일)이어야 합니다")
+            by_weekday[weekday] = (pattern.planned_in, pattern.planned_out)
+    
+    conn = get_db()
+    c = conn.cursor()
+    user_ids = resolve_schedule_users(c, current, data.team_id, data.user_ids, write=True)
+    
+    # 패턴을 날짜별로 펼침 (쉬는 날은 달력 캐시로 판단)
+    work_days = set(work_calendar.work_days(current["tid"], date_from, date_to))
+    planned, skipped_holidays = {}, []
+    for d in work_calendar.dates(date_from, date_to):
+        times = by_weekday.get(date_module.fromisoformat(d).weekday())
+        if times is None:
+            continue
+        if data.skip_holidays and d not in work_days:
+            day_off = work_calendar.day_off(current["tid"], d)
+            if day_off != "주말":
+                skipped_holidays.append({"date": d, "name": day_off})
+                continue
+        planned[d] = times
+    if len(planned) * len(user_ids) > MAX_BULK_SCHEDULE_ROWS:
+        raise HTTPException(status_code=400, detail=f"한 번에 {MAX_BULK_SCHEDULE_ROWS}건까지 계획할 수 있습니다")
+    
+    existing, leaves = {}, {}
+    if user_ids and planned:
+        placeholders = ",".join(["?"] * len(user_ids))
+        params = [current["tid"], date_from, date_to] + user_ids
+        db_execute(c, f"""
+            SELECT user_id, date, planned_in, planned_out FROM schedule
+            WHERE tenant_id = ? AND date >= ? AND date <= ? AND user_id IN ({placeholders})
+        """, params)
+        existing = {(row["user_id"], row["date"]): (row["planned_in"], row["planned_out"]) for row in c.fetchall()}
+        db_execute(c, f"""
+            SELECT user_id, date, type FROM leave
+            WHERE tenant_id = ? AND date >= ? AND date <= ? AND user_id IN ({placeholders})
+        """, params)
+        leaves = {(row["user_id"], row["date"]): row["type"] for row in c.fetchall()}
+    
+    rows, unchanged = [], 0
+    conflicts = {kind: {"count": 0, "sample": [], "truncated": False} for kind in ("leave", "changed")}
+
+    def add_conflict(kind, item):
+        conflict = conflicts[kind]
+        conflict["count"] += 1
+        if len(conflict["sample"]) < BULK_CONFLICT_SAMPLE:
+            conflict["sample"].append(item)
+        else:
+            conflict["truncated"] = True
+
+    for user_id in user_ids:
+        for d, (planned_in, planned_out) in planned.items():
+            key = (user_id, d)
+            if key in leaves:
+                add_conflict("leave", {"user_id": user_id, "date": d, "type": leaves[key]})
+                continue
+            current_times = existing.get(key)
+            if current_times == (planned_in, planned_out):
+                unchanged += 1
+                continue
+            if current_times is not None:
+                add_conflict("changed", {
+                    "user_id": user_id, "date": d,
+                    "planned_in": current_times[0], "planned_out": current_times[1]
+                })
+                if not data.overwrite:
+                    continue
+            rows.append((current["tid"], user_id, d, planned_in, planned_out))
+    
+    if rows and not data.dry_run:
+        db_execute_values(c, """
+            INSERT INTO schedule (tenant_id, user_id, date, planned_in, planned_out) VALUES {values}
+            ON CONFLICT(user_id, date) DO UPDATE SET
+            planned_in = excluded.planned_in, planned_out = excluded.planned_out
+        """, rows)
+        conn.commit()
+        replica_router.mark_write()
+    
+    return {
+        "success": True,
+        "dry_run": data.dry_run,
+        "users": len(user_ids),
+        "written": len(rows),
+        "unchanged": unchanged,
+        "skipped_holidays": skipped_holidays,
+        "conflicts": conflicts
+    }
+
+SCHEDULE_FIELDS = ["user_id", "date", "planned_in", "planned_out", "is_default"]
+
+@app.get("/api/schedule/bulk")
+def get_bulk_schedule(date_from: str, date_to: str, team_id: Optional[int] = None, user_ids: str = "",
+                      format: str = "rows", current=Depends(get_current_user)):
+    """팀/여러 직원의 기간 일정 (근무일 + 쉬는 날에 잡힌 일정, 없으면 회사 기본값 + is_default)
+
+    user_ids는 쉼표로 구분. 대량 조회는 format=columnar 권장.
+    """
+    date_from, date_to = parse_date_range(date_from, date_to, MAX_BULK_SCHEDULE_DAYS)
+    try:
+        ids = [int(v) for v in user_ids.split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="user_ids는 쉼표로 구분한 숫자여야 합니다")
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    members = resolve_schedule_users(c, current, team_id, ids, write=False)
+    settings = tenant_cache.settings(current["tid"])
+    
+    stored = {}
+    if members:
+        db_execute(c, f"""
+            SELECT user_id, date, planned_in, planned_out FROM schedule
+            WHERE tenant_id = ? AND date >= ? AND date <= ? AND user_id IN ({",".join(["?"] * len(members))})
+        """, [current["tid"], date_from, date_to] + members)
+        stored = {(row["user_id"], row["date"]): row for row in c.fetchall()}
+    
+    dates = work_calendar.dates(date_from, date_to)
+    work_days = set(work_calendar.work_days(current["tid"], date_from, date_to))
+    result = []
+    for user_id in members:
+        for d in dates:
+            row = stored.get((user_id, d))
+            if row is None and d not in work_days:
+                continue
+            result.append({
+                "user_id": user_id, "date": d,
+                "planned_in": row["planned_in"] if row else settings["default_in"],
+                "planned_out": row["planned_out"] if row else settings["default_out"],
+                "is_default": row is None
+            })
+    return rows_response(result, SCHEDULE_FIELDS, format)
+
+# --- 팀 현황 ---
+@app.get("/api/team/status/{team_id}")
+def get_team_status(team_id: int, date: str = None, current=Depends(get_current_user)):
+    if current["team_id"] != team_id and current["role"] != "admin":
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    conn = get_db(readonly=True)
+    c = conn.cursor()
     
     # 날짜 파라미터가 없으면 오늘
     if not date:
@@ -677,8 +2116,12 @@ def get_team_status(team_id: int, date: str = None):
         target_date = date
     
     # 팀원 목록 (관리자 제외)
-    db_execute(c, "SELECT id, name FROM user WHERE team_id = ? AND role != 'admin'", (team_id,))
+    db_execute(c, 
+        "SELECT id, name FROM user WHERE tenant_id = ? AND team_id = ? AND role != 'admin'",
+        (current["tid"], team_id)
+    )
     members = c.fetchall()
+    settings = tenant_cache.settings(current["tid"])
     
     result = []
     for member in members:
@@ -721,16 +2164,127 @@ def get_team_status(team_id: int, date: str = None):
             "leave": leave_text,
             "clock_in": attendance["clock_in"] if attendance else None,
             "clock_out": attendance["clock_out"] if attendance else None,
-            "planned_in": schedule["planned_in"] if schedule else COMPANY_SETTINGS["default_in"],
-            "planned_out": schedule["planned_out"] if schedule else COMPANY_SETTINGS["default_out"]
+            "planned_in": schedule["planned_in"] if schedule else settings["default_in"],
+            "planned_out": schedule["planned_out"] if schedule else settings["default_out"]
         })
     
     return result
 
-@app.get("/api/admin/all-status")
-def get_all_status():
+@app.get("/api/team/calendar/{team_id}")
+def get_team_calendar(team_id: int, month: str = None, current=Depends(get_current_user)):
+    """팀 월간 캘린더 (날짜 × 팀원 2차원 배열)
+
+    출퇴근/휴가/일정을 각각 한 번의 기간 조회로 가져와 한 번에 합침.
+    각 필드는 [날짜 인덱스][팀원 인덱스] 순서의 배열.
+    """
+    if current["team_id"] != team_id and current["role"] != "admin":
+        raise HTTPException(status_code=403, detail="권한이 없습니다")
+    
+    first_day = parse_calendar_date(month, "month", "%Y-%m") if month else get_kst_today().replace(day=1)
+    last_day = (first_day + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    dates = work_calendar.dates(first_day.isoformat(), last_day.isoformat())
+    holidays = work_calendar.holidays(current["tid"], dates[0], dates[-1])
+    work_days = set(work_calendar.work_days(current["tid"], dates[0], dates[-1]))
+    
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    
+    # 팀원 목록 (관리자 제외)
+    db_execute(c, 
+        "SELECT id, name FROM user WHERE tenant_id = ? AND team_id = ? AND role != 'admin' ORDER BY id",
+        (current["tid"], team_id)
+    )
+    members = [{"id": row["id"], "name": row["name"]} for row in c.fetchall()]
+    settings = tenant_cache.settings(current["tid"])
+    
+    date_index = {d: i for i, d in enumerate(dates)}
+    member_index = {m["id"]: j for j, m in enumerate(members)}
+    
+    def grid(value):
+        return [[value] * len(members) for _ in dates]
+    
+    clock_in = grid(None)
+    clock_out = grid(None)
+    work_minutes = grid(0)
+    working = grid(False)
+    leave = grid(None)
+    planned_in = grid(settings["default_in"])
+    planned_out = grid(settings["default_out"])
+    
+    team_filter = """
+        JOIN user u ON x.user_id = u.id
+        WHERE x.tenant_id = ? AND u.team_id = ? AND u.role != 'admin' AND x.date >= ? AND x.date <= ?
+    """
+    params = (current["tid"], team_id, dates[0], dates[-1])
+    
+    # 출퇴근: 첫 출근, 마지막 퇴근, 세션 합계
+    db_execute(c, f"""
+        SELECT x.user_id, x.date, x.clock_in, x.clock_out, x.work_minutes
+        FROM attendance x {team_filter}
+        ORDER BY x.id
+    """, params)
+    for row in c.fetchall():
+        i, j = date_index[row["date"]], member_index[row["user_id"]]
+        if clock_in[i][j] is None:
+            clock_in[i][j] = row["clock_in"]
+        clock_out[i][j] = row["clock_out"]
+        work_minutes[i][j] += row["work_minutes"] or 0
+        working[i][j] = row["clock_out"] is None
+    
+    # 휴가
+    db_execute(c, f"SELECT x.user_id, x.date, x.type FROM leave x {team_filter}", params)
+    for row in c.fetchall():
+        leave[date_index[row["date"]]][member_index[row["user_id"]]] = row["type"]
+    
+    # 일정 (없으면 회사 기본값)
+    db_execute(c, f"SELECT x.user_id, x.date, x.planned_in, x.planned_out FROM schedule x {team_filter}", params)
+    for row in c.fetchall():
+        i, j = date_index[row["date"]], member_index[row["user_id"]]
+        planned_in[i][j] = row["planned_in"]
+        planned_out[i][j] = row["planned_out"]
+    
+    leave_names = {"annual": "연차", "half_am": "오전반차", "half_pm": "오후반차"}
+    status = grid("미출근")
+    for i, d in enumerate(dates):
+        for j in range(len(members)):
+            if leave[i][j]:
+                status[i][j] = leave_names.get(leave[i][j], "휴가")
+            elif clock_in[i][j]:
+                status[i][j] = "근무중" if working[i][j] else "퇴근"
+            elif d not in work_days:
+                status[i][j] = "휴일"
+    
+    return {
+        "team_id": team_id,
+        "month": first_day.strftime("%Y-%m"),
+        "dates": dates,
+        "holidays": holidays,
+        "members": members,
+        "status": status,
+        "leave": leave,
+        "clock_in": clock_in,
+        "clock_out": clock_out,
+        "work_minutes": work_minutes,
+        "planned_in": planned_in,
+        "planned_out": planned_out
+    }
+
+class StatusItem(BaseModel):
+    id: int
+    name: str
+    role: Optional[str]
+    team: Optional[str]
+    status: str
+    clock_in: Optional[str]
+    clock_out: Optional[str]
+    work_minutes: int
+
+STATUS_FIELDS = list(StatusItem.model_fields)
+
+@app.get("/api/admin/all-status", response_model=Union[List[StatusItem], ColumnarPayload])
+def get_all_status(format: str = "rows", current=Depends(require_admin)):
     """관리자용: 전체 직원 현황 (관리자 제외, 최종 출퇴근만)"""
-    conn = get_db()
+    conn = get_db(readonly=True)
     c = conn.cursor()
     today = get_kst_today().isoformat()
     
@@ -739,28 +2293,31 @@ def get_all_status():
         SELECT u.id, u.name, u.role, t.name as team_name
         FROM user u
         LEFT JOIN team t ON u.team_id = t.id
-        WHERE u.role != 'admin'
-    """)
+        WHERE u.tenant_id = ? AND u.role != 'admin'
+    """, (current["tid"],))
     users = c.fetchall()
     
+    # 오늘 출퇴근 기록 (직원별 마지막 기록만 남김)
+    db_execute(c, """
+        SELECT user_id, clock_in, clock_out, work_minutes
+        FROM attendance
+        WHERE tenant_id = ? AND date = ?
+        ORDER BY id
+    """, (current["tid"], today))
+    last_attendance = {row["user_id"]: row for row in c.fetchall()}
+    
+    # 오늘 휴가
+    db_execute(c, "SELECT user_id, type FROM leave WHERE tenant_id = ? AND date = ?", (current["tid"], today))
+    leaves = {row["user_id"]: row["type"] for row in c.fetchall()}
+    
     result = []
     for user in users:
-        # 최종 출퇴근 기록만 가져오기
-        db_execute(c, """
-            SELECT clock_in, clock_out, work_minutes 
-            FROM attendance 
-            WHERE user_id = ? AND date = ? 
-            ORDER BY id DESC LIMIT 1
-        """, (user["id"], today))
-        att = c.fetchone()
-        
-        # 휴가 확인
-        db_execute(c, "SELECT type FROM leave WHERE user_id = ? AND date = ?", (user["id"], today))
-        leave = c.fetchone()
+        att = last_attendance.get(user["id"])
+        leave = leaves.get(user["id"])
         
         status = "미출근"
         if leave:
-            status = {"annual": "연차", "half_am": "오전반차", "half_pm": "오후반차"}.get(leave["type"], "휴가")
+            status = {"annual": "연차", "half_am": "오전반차", "half_pm": "오후반차"}.get(leave, "휴가")
         elif att and att["clock_in"]:
             status = "퇴근" if att["clock_out"] else "근무중"
         
@@ -775,147 +2332,520 @@ def get_all_status():
             "work_minutes": att["work_minutes"] if att else 0
         })
     
-    return result
+    return rows_response(result, STATUS_FIELDS, format)
 
-@app.get("/api/admin/hours")
-def get_admin_hours(period: str = "week"):
+class HoursItem(BaseModel):
+    id: int
+    name: str
+    team: Optional[str]
+    total_minutes: int
+    target_minutes: int
+
+HOURS_FIELDS = list(HoursItem.model_fields)
+
+@app.get("/api/admin/hours", response_model=Union[List[HoursItem], ColumnarPayload])
+def get_admin_hours(period: str = "week", format: str = "rows", current=Depends(require_admin)):
     """관리자용: 직원별 근무시간 (주간/월간)"""
-    conn = get_db()
+    conn = get_db(readonly=True)
     c = conn.cursor()
     
     today = get_kst_today()
     
     if period == "week":
-        # 이번 주 월~금
-        monday = today - timedelta(days=today.weekday())
-        dates = [(monday + timedelta(days=i)).isoformat() for i in range(5)]
+        # 이번 주 월~일
+        date_from, date_to = get_week_range(today)
     else:
         # 이번 달 1일 ~ 오늘
-        first_day = today.replace(day=1)
-        dates = [(first_day + timedelta(days=i)).isoformat() for i in range((today - first_day).days + 1)]
+        date_from, date_to = today.replace(day=1).isoformat(), today.isoformat()
     
-    # 모든 직원 목록
+    # 목표 근무시간은 기간 안의 근무일 기준 (주말, 공휴일, 회사 휴무일 제외)
+    target = target_minutes(tenant_cache.settings(current["tid"]), len(work_calendar.work_days(current["tid"], date_from, date_to)))
+    
+    # 직원별 기간 총 근무시간 (한 번의 집계 쿼리)
     db_execute(c, """
-        SELECT u.id, u.name, t.name as team_name 
-        FROM user u 
+        SELECT u.id, u.name, t.name as team_name, COALESCE(SUM(a.work_minutes), 0) as total
+        FROM user u
         LEFT JOIN team t ON u.team_id = t.id
-        WHERE u.role != 'admin'
-    """)
-    users = c.fetchall()
+        LEFT JOIN attendance a ON a.user_id = u.id AND a.date >= ? AND a.date <= ?
+        WHERE u.tenant_id = ? AND u.role != 'admin'
+        GROUP BY u.id, u.name, t.name
+    """, (date_from, date_to, current["tid"]))
+    
+    result = [
+        {"id": row["id"], "name": row["name"], "team": row["team_name"], "total_minutes": row["total"], "target_minutes": target}
+        for row in c.fetchall()
+    ]
+    
+    # 근무시간 내림차순 정렬
+    result.sort(key=lambda x: x["total_minutes"], reverse=True)
     
+    return rows_response(result, HOURS_FIELDS, format)
+
+# --- 근로시간 관리 (주 52시간) ---
+def fetch_user_names(c, user_ids):
+    """{user_id: (이름, 팀 이름)}"""
+    if not user_ids:
+        return {}
+    placeholders = ",".join(["?"] * len(user_ids))
+    db_execute(c, f"""
+        SELECT u.id, u.name, t.name as team_name
+        FROM user u
+        LEFT JOIN team t ON u.team_id = t.id
+        WHERE u.id IN ({placeholders})
+    """, list(user_ids))
+    return {row["id"]: (row["name"], row["team_name"]) for row in c.fetchall()}
+
+@app.get("/api/admin/compliance")
+def get_compliance(current=Depends(require_admin)):
+    """관리자용: 주 52시간 초과/임박 직원 (이번 주 합계, 최근 7일 합계)
+
+    종료된 세션은 집계 테이블에서, 진행 중인 세션은 현재 시각 기준으로 더함
+    """
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    today = get_kst_today()
+    week_start = today - timedelta(days=today.weekday())
+    rolling_start = today - timedelta(days=6)
+    
+    db_execute(c, 
+        "SELECT user_id, minutes FROM weekly_hours WHERE tenant_id = ? AND week_start = ?",
+        (current["tid"], week_start.isoformat())
+    )
+    week_minutes = {row["user_id"]: row["minutes"] for row in c.fetchall()}
+    
+    db_execute(c, """
+        SELECT user_id, SUM(minutes) AS minutes FROM daily_hours
+        WHERE tenant_id = ? AND date >= ? AND date <= ?
+        GROUP BY user_id
+    """, (current["tid"], rolling_start.isoformat(), today.isoformat()))
+    rolling_minutes = {row["user_id"]: row["minutes"] for row in c.fetchall()}
+    
+    # 진행 중인 세션 (오늘 출근, 아직 퇴근 안 함)
+    db_execute(c, 
+        "SELECT user_id, clock_in FROM attendance WHERE tenant_id = ? AND date = ? AND clock_out IS NULL",
+        (current["tid"], today.isoformat())
+    )
+    now_time = datetime.strptime(get_kst_now().strftime("%H:%M"), "%H:%M")
+    live_minutes = {}
+    for row in c.fetchall():
+        minutes = int((now_time - datetime.strptime(row["clock_in"], "%H:%M")).total_seconds() / 60)
+        live_minutes[row["user_id"]] = live_minutes.get(row["user_id"], 0) + max(0, minutes)
+    
+    settings = tenant_cache.settings(current["tid"])
+    limit_minutes = settings["max_weekly_hours"] * 60
+    warning_minutes = settings["warning_weekly_hours"] * 60
+    
+    at_risk = {}
+    for user_id in set(week_minutes) | set(rolling_minutes) | set(live_minutes):
+        live = live_minutes.get(user_id, 0)
+        week = week_minutes.get(user_id, 0) + live
+        rolling = rolling_minutes.get(user_id, 0) + live
+        peak = max(week, rolling)
+        if peak >= warning_minutes:
+            at_risk[user_id] = {
+                "week_minutes": week,
+                "rolling_minutes": rolling,
+                "live_minutes": live,
+                "remaining_minutes": limit_minutes - week,
+                "level": "over" if peak > limit_minutes else "warning"
+            }
+    
+    names = fetch_user_names(c, list(at_risk))
     result = []
-    for user in users:
-        # 해당 기간 총 근무시간
-        placeholders = ','.join(['?' for _ in dates])
-        db_execute(c, f"""
-            SELECT SUM(work_minutes) as total 
-            FROM attendance 
-            WHERE user_id = ? AND date IN ({placeholders})
-        """, [user["id"]] + dates)
+    for user_id, info in at_risk.items():
+        name, team = names.get(user_id, ("", None))
+        result.append({"id": user_id, "name": name, "team": team, **info})
+    result.sort(key=lambda x: max(x["week_minutes"], x["rolling_minutes"]), reverse=True)
+    
+    return {
+        "week_start": week_start.isoformat(),
+        "max_weekly_hours": settings["max_weekly_hours"],
+        "warning_weekly_hours": settings["warning_weekly_hours"],
+        "employees": result
+    }
+
+@app.get("/api/admin/compliance/audit")
+def audit_compliance(year: int = None, rebuild: bool = False, current=Depends(require_admin)):
+    """관리자용: 1년치 전 직원 주 52시간 감사 (attendance를 한 번 스트리밍하며 계산)
+
+    - 주(월~일) 합계와 최근 7일 이동 합계의 최댓값을 직원별로 계산
+    - rebuild=true면 같은 패스에서 해당 기간의 집계 테이블도 다시 채움
+    """
+    year = year or get_kst_today().year
+    # 연도 경계의 주가 잘리지 않도록 월요일 ~ 일요일로 맞춤
+    start = date_module(year, 1, 1)
+    start -= timedelta(days=start.weekday())
+    end = date_module(year, 12, 31)
+    end += timedelta(days=6 - end.weekday())
+    
+    conn = get_db() if rebuild else get_db(readonly=True)
+    rebuilder = WorkHoursRebuilder(conn, current["tid"], start.isoformat(), end.isoformat()) if rebuild else None
+    
+    settings = tenant_cache.settings(current["tid"])
+    limit_minutes = settings["max_weekly_hours"] * 60
+    warning_minutes = settings["warning_weekly_hours"] * 60
+    flagged = {}
+    
+    def finish_user(user_id, state):
+        state["weeks"].append((state["week_start"], state["week_minutes"]))
+        weeks_over = [{"week_start": w, "minutes": m} for w, m in state["weeks"] if m > limit_minutes]
+        max_week = max(m for _, m in state["weeks"])
+        if max(max_week, state["max_rolling"]) >= warning_minutes:
+            flagged[user_id] = {
+                "max_weekly_minutes": max_week,
+                "max_rolling_minutes": state["max_rolling"],
+                "max_rolling_end": state["max_rolling_end"],
+                "weeks_over": weeks_over
+            }
+    
+    user_id, state = None, None
+    for row_user, day, minutes in iter_daily_minutes(conn, current["tid"], start.isoformat(), end.isoformat()):
+        if rebuilder:
+            rebuilder.add(row_user, day, minutes)
+        if row_user != user_id:
+            if state:
+                finish_user(user_id, state)
+            user_id = row_user
+            state = {"window": deque(), "window_sum": 0, "max_rolling": 0, "max_rolling_end": None,
+                     "week_start": None, "week_minutes": 0, "weeks": []}
         
-        row = c.fetchone()
-        total_minutes = row["total"] or 0
+        d = date_module.fromisoformat(day)
+        # 최근 7일 이동 합계
+        window = state["window"]
+        window.append((d, minutes))
+        state["window_sum"] += minutes
+        while window[0][0] <= d - timedelta(days=7):
+            state["window_sum"] -= window.popleft()[1]
+        if state["window_sum"] > state["max_rolling"]:
+            state["max_rolling"] = state["window_sum"]
+            state["max_rolling_end"] = day
         
-        result.append({
-            "id": user["id"],
-            "name": user["name"],
-            "team": user["team_name"],
-            "total_minutes": total_minutes
-        })
+        # 주간 합계
+        week = week_start_of(day)
+        if week != state["week_start"]:
+            if state["week_start"]:
+                state["weeks"].append((state["week_start"], state["week_minutes"]))
+            state["week_start"], state["week_minutes"] = week, 0
+        state["week_minutes"] += minutes
+    if state:
+        finish_user(user_id, state)
     
-    # 근무시간 내림차순 정렬
-    result.sort(key=lambda x: x["total_minutes"], reverse=True)
+    if rebuilder:
+        rebuilder.finish()
+        conn.commit()
     
-    return result
+    names = fetch_user_names(conn.cursor(), list(flagged))
+    employees = []
+    for uid, info in flagged.items():
+        name, team = names.get(uid, ("", None))
+        employees.append({"id": uid, "name": name, "team": team, **info})
+    employees.sort(key=lambda x: max(x["max_weekly_minutes"], x["max_rolling_minutes"]), reverse=True)
+    
+    return {
+        "year": year,
+        "date_from": start.isoformat(),
+        "date_to": end.isoformat(),
+        "max_weekly_hours": settings["max_weekly_hours"],
+        "rebuilt": rebuild,
+        "employees": employees
+    }
+
+# --- 사무실 재실 인원 ---
+MAX_OCCUPANCY_SLOTS = 20000
+
+def _hhmm_to_minutes(value: str) -> int:
+    return int(value[:2]) * 60 + int(value[3:5])
+
+@app.get("/api/admin/occupancy")
+def get_occupancy(date_from: str = None, date_to: str = None, resolution: int = 15,
+                  team_id: Optional[int] = None, current=Depends(require_admin)):
+    """관리자용: 구간(resolution분)별 최대 재실 인원 시계열 (전체 + 팀별)
+
+    세션의 출근/퇴근을 +1/-1 이벤트로 바꿔 시간순으로 한 번 훑음 - O(n log n).
+    퇴근 안 한 세션은 현재 시각까지 재실로 계산. 한 사람의 세션이 겹쳐도 한 명으로 셈.
+    """
+    today = get_kst_today()
+    try:
+        start_day = date_module.fromisoformat(date_from) if date_from else today
+        end_day = date_module.fromisoformat(date_to) if date_to else start_day
+    except ValueError:
+        raise HTTPException(status_code=400, detail="날짜는 YYYY-MM-DD 형식이어야 합니다")
+    if end_day < start_day or resolution < 1:
+        raise HTTPException(status_code=400, detail="기간 또는 resolution 값이 잘못되었습니다")
+    
+    range_minutes = ((end_day - start_day).days + 1) * 1440
+    slot_count = math.ceil(range_minutes / resolution)
+    if slot_count > MAX_OCCUPANCY_SLOTS:
+        raise HTTPException(status_code=400, detail=f"구간 수가 너무 많습니다 (최대 {MAX_OCCUPANCY_SLOTS}개)")
+    
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    
+    db_execute(c, "SELECT id, name FROM team WHERE tenant_id = ?", (current["tid"],))
+    team_names = {row["id"]: row["name"] for row in c.fetchall()}
+    
+    # 기간 내 세션 + 기간 이전에 시작해서 아직 안 끝난 세션
+    conditions = ["a.tenant_id = ?", "((a.date >= ? AND a.date <= ?) OR (a.clock_out IS NULL AND a.date < ?))"]
+    params = [current["tid"], start_day.isoformat(), end_day.isoformat(), start_day.isoformat()]
+    if team_id is not None:
+        conditions.append("u.team_id = ?")
+        params.append(team_id)
+    db_execute(c, f"""
+        SELECT a.user_id, a.date, a.clock_in, a.clock_out, u.team_id
+        FROM attendance a
+        JOIN user u ON a.user_id = u.id
+        WHERE {' AND '.join(conditions)} AND a.clock_in IS NOT NULL
+    """, params)
+    
+    now = get_kst_now()
+    now_offset = (now.date() - start_day).days * 1440 + now.hour * 60 + now.minute
+    
+    # (시각, 변화량, 팀, 사용자) - 같은 시각이면 퇴근(-1)을 먼저 처리
+    events = []
+    for row in c.fetchall():
+        day_offset = (date_module.fromisoformat(row["date"]) - start_day).days * 1440
+        start = day_offset + _hhmm_to_minutes(row["clock_in"])
+        end = day_offset + _hhmm_to_minutes(row["clock_out"]) if row["clock_out"] else now_offset
+        start, end = max(start, 0), min(end, range_minutes)
+        if end <= start:
+            continue
+        team = team_names.get(row["team_id"], "미지정")
+        events.append((start, 1, team, row["user_id"]))
+        events.append((end, -1, team, row["user_id"]))
+    events.sort(key=lambda e: (e[0], e[1]))
+    
+    teams = sorted({e[2] for e in events})
+    counts = {t: 0 for t in teams}
+    total = 0
+    open_sessions = {}  # user_id -> 진행 중인 세션 수
+    
+    def apply(event):
+        nonlocal total
+        _, delta, team, user_id = event
+        before = open_sessions.get(user_id, 0)
+        open_sessions[user_id] = before + delta
+        # 0 ↔ 1 로 바뀔 때만 인원 변화
+        if before == 0 or before + delta == 0:
+            counts[team] += delta
+            total += delta
+    
+    total_series = [0] * slot_count
+    team_series = {t: [0] * slot_count for t in teams}
+    
+    i = 0
+    for slot in range(slot_count):
+        slot_start = slot * resolution
+        slot_end = slot_start + resolution
+        # 구간 시작 시각까지의 이벤트 반영 → 구간 시작 시점 인원
+        while i < len(events) and events[i][0] <= slot_start:
+            apply(events[i])
+            i += 1
+        peak_total = total
+        peak_team = dict(counts)
+        # 구간 안에서 바뀌는 인원 중 최댓값
+        while i < len(events) and events[i][0] < slot_end:
+            apply(events[i])
+            team = events[i][2]
+            peak_total = max(peak_total, total)
+            peak_team[team] = max(peak_team[team], counts[team])
+            i += 1
+        total_series[slot] = peak_total
+        for t in teams:
+            team_series[t][slot] = peak_team[t]
+    
+    base = datetime.combine(start_day, datetime.min.time())
+    return {
+        "date_from": start_day.isoformat(),
+        "date_to": end_day.isoformat(),
+        "resolution": resolution,
+        "slots": [(base + timedelta(minutes=slot * resolution)).strftime("%Y-%m-%dT%H:%M") for slot in range(slot_count)],
+        "total": total_series,
+        "teams": team_series
+    }
 
 # --- 휴가 ---
 @app.post("/api/leave")
-def request_leave(data: LeaveRequest):
+def request_leave(data: LeaveRequest, current=Depends(get_current_user)):
+    check_user_access(current, data.user_id)
+    parse_calendar_date(data.date)
+    day_off = work_calendar.day_off(current["tid"], data.date)
+    if day_off:
+        raise HTTPException(status_code=400, detail=f"근무일이 아닙니다 ({day_off})")
     conn = get_db()
     c = conn.cursor()
     
-    # 연차 차감량 계산
-    deduct = 1.0 if data.type == "annual" else 0.5
-    
-    # 잔여 연차 확인
-    db_execute(c, "SELECT annual_leave_total, annual_leave_used FROM user WHERE id = ?", (data.user_id,))
-    user = c.fetchone()
-    remaining = user["annual_leave_total"] - user["annual_leave_used"]
-    
-    if remaining < deduct:
-        raise HTTPException(status_code=400, detail=f"연차가 부족합니다! (잔여: {remaining}일)")
+    # 연차 차감량 계산 (휴가 날짜의 연도 잔액에서 차감)
+    deduct = LEAVE_DAYS.get(data.type, 0.5)
+    year = int(data.date[:4])
+    if year < get_kst_today().year:
+        raise HTTPException(status_code=400, detail="지난 연도의 휴가는 등록할 수 없습니다")
     
     try:
         db_execute(c, 
-            "INSERT INTO leave (user_id, date, type) VALUES (?, ?, ?)",
-            (data.user_id, data.date, data.type)
-        )
-        # 연차 사용량 업데이트
-        db_execute(c, 
-            "UPDATE user SET annual_leave_used = annual_leave_used + ? WHERE id = ?",
-            (deduct, data.user_id)
+            "INSERT INTO leave (tenant_id, user_id, date, type) VALUES (?, ?, ?, ?) RETURNING id",
+            (current["tid"], data.user_id, data.date, data.type)
         )
+        leave_id = c.fetchone()["id"]
+        # 잔여 연차 확인과 차감을 한 번에 (동시 신청해도 초과 사용 불가)
+        if not use_leave_days(c, current["tid"], data.user_id, year, deduct, leave_id):
+            db_execute(c, "SELECT granted - used - expired AS remaining FROM leave_balance WHERE user_id = ? AND year = ?",
+                       (data.user_id, year))
+            remaining = c.fetchone()["remaining"]
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=f"연차가 부족합니다! (잔여: {remaining}일)")
+        record_change(c, current["tid"], "leave", "create", leave_id, data.user_id, {
+            "id": leave_id, "user_id": data.user_id, "date": data.date, "type": data.type
+        })
         conn.commit()
+        replica_router.mark_write()
         return {"success": True, "message": "휴가가 등록되었습니다!"}
     except sqlite3.IntegrityError:
+        conn.rollback()
         raise HTTPException(status_code=400, detail="해당 날짜에 이미 휴가가 등록되어 있습니다")
 
 @app.delete("/api/leave/{leave_id}")
-def cancel_leave(leave_id: int):
+def cancel_leave(leave_id: int, current=Depends(get_current_user)):
     conn = get_db()
     c = conn.cursor()
     
     # 휴가 정보 가져오기
-    db_execute(c, "SELECT user_id, type FROM leave WHERE id = ?", (leave_id,))
+    db_execute(c, "SELECT id, user_id, date, type FROM leave WHERE id = ?", (leave_id,))
     leave = c.fetchone()
     
     if not leave:
         raise HTTPException(status_code=404, detail="휴가를 찾을 수 없습니다")
-    
-    # 연차 복원
-    restore = 1.0 if leave["type"] == "annual" else 0.5
+    check_user_access(current, leave["user_id"])
     
     db_execute(c, "DELETE FROM leave WHERE id = ?", (leave_id,))
-    db_execute(c, 
-        "UPDATE user SET annual_leave_used = annual_leave_used - ? WHERE id = ?",
-        (restore, leave["user_id"])
-    )
+    # 연차 복원
+    restore_leave_days(c, current["tid"], leave["user_id"], int(leave["date"][:4]),
+                       LEAVE_DAYS.get(leave["type"], 0.5), leave_id)
+    record_change(c, current["tid"], "leave", "delete", leave_id, leave["user_id"], dict(leave))
     conn.commit()
+    replica_router.mark_write()
     
     return {"success": True, "message": "휴가가 취소되었습니다!"}
 
+LEAVE_COLUMNS = {"id": "id", "user_id": "user_id", "date": "date", "type": "type"}
+
 @app.get("/api/leave/my/{user_id}")
-def get_my_leaves(user_id: int):
-    conn = get_db()
+def get_my_leaves(user_id: int, response: Response, limit: Optional[int] = None,
+                  cursor: Optional[str] = None, fields: Optional[str] = None,
+                  date_from: Optional[str] = None, date_to: Optional[str] = None,
+                  type: Optional[str] = None, current=Depends(get_current_user)):
+    """내 휴가 내역 (최근 날짜 순, 다음 페이지는 X-Next-Cursor 헤더의 cursor로 조회)"""
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
     c = conn.cursor()
-    db_execute(c, 
-        "SELECT * FROM leave WHERE user_id = ? ORDER BY date DESC",
-        (user_id,)
-    )
-    return [dict(row) for row in c.fetchall()]
+    limit = clamp_limit(limit)
+    selected = select_fields(fields, LEAVE_COLUMNS)
+    
+    conditions, params = ["user_id = ?"], [user_id]
+    if date_from:
+        conditions.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        conditions.append("date <= ?")
+        params.append(date_to)
+    if type:
+        conditions.append("type = ?")
+        params.append(type)
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, (str, int))
+        conditions.append("(date < ? OR (date = ? AND id < ?))")
+        params += [last_date, last_date, last_id]
+    
+    db_execute(c, f"""
+        SELECT id, user_id, date, type FROM leave
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date DESC, id DESC LIMIT ?
+    """, params + [limit + 1])
+    return paginate(c.fetchall(), limit, selected, ["date", "id"], response)
 
 @app.get("/api/leave/user-week/{user_id}")
-def get_user_week_leaves(user_id: int):
+def get_user_week_leaves(user_id: int, current=Depends(get_current_user)):
     """특정 유저의 이번 주 휴가 목록"""
-    conn = get_db()
+    conn = get_db(readonly=True)
     c = conn.cursor()
-    week_dates = get_week_dates()
+    check_team_access(c, current, user_id)
+    week_start, week_end = get_week_range()
     
     db_execute(c, 
-        f"SELECT * FROM leave WHERE user_id = ? AND date IN ({','.join(['?']*5)})",
-        [user_id] + week_dates
+        "SELECT * FROM leave WHERE user_id = ? AND date BETWEEN ? AND ?",
+        (user_id, week_start, week_end)
     )
     return [dict(row) for row in c.fetchall()]
 
+@app.get("/api/leave/balance/{user_id}")
+def get_leave_balance(user_id: int, year: Optional[int] = None, current=Depends(get_current_user)):
+    """연차 잔액 (잔액 캐시 기준, year 없으면 올해)"""
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    year = year or get_kst_today().year
+    db_execute(c, f"""
+        SELECT {LEAVE_TOTAL_SQL} AS granted, {LEAVE_USED_SQL} AS used, COALESCE(b.expired, 0) AS expired
+        FROM user u {LEAVE_BALANCE_JOIN} WHERE u.id = ?
+    """, (year, user_id))
+    row = c.fetchone()
+    if not row:
+        raise HTTPException(status_code=404, detail="사용자를 찾을 수 없습니다")
+    return {
+        "user_id": user_id,
+        "year": year,
+        "granted": row["granted"],
+        "used": row["used"],
+        "expired": row["expired"],
+        "remaining": row["granted"] - row["used"] - row["expired"]
+    }
+
+@app.get("/api/leave/ledger/{user_id}")
+def get_leave_ledger(user_id: int, year: Optional[int] = None, current=Depends(get_current_user)):
+    """연차 원장 (부여/사용/취소/소멸 내역, 오래된 순)"""
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    db_execute(c, """
+        SELECT id, year, kind, days, leave_id, created_at FROM leave_ledger
+        WHERE user_id = ? AND year = ? ORDER BY id
+    """, (user_id, year or get_kst_today().year))
+    return [dict(row) for row in c.fetchall()]
+
 @app.put("/api/user/annual-leave")
-def update_annual_leave(data: AnnualLeaveUpdate):
+def update_annual_leave(data: AnnualLeaveUpdate, current=Depends(get_current_user)):
+    """연간 연차 일수 변경 (새로 부여하는 해부터 적용, 올해와 이미 잔액이 생긴 다음 해는 차이만큼 조정 기록)"""
+    check_user_access(current, data.user_id)
     conn = get_db()
     c = conn.cursor()
     db_execute(c, 
         "UPDATE user SET annual_leave_total = ? WHERE id = ?",
         (data.annual_leave_total, data.user_id)
     )
+    year = get_kst_today().year
+    ensure_leave_year(c, data.user_id, year)
+    db_execute(c, 
+        "SELECT year, granted FROM leave_balance WHERE user_id = ? AND year >= ? ORDER BY year",
+        (data.user_id, year)
+    )
+    adjustments = []
+    for row in c.fetchall():
+        if row["granted"] == data.annual_leave_total:
+            continue
+        # 동시에 바뀌었으면 조정량이 틀리므로 다시 시도하게 함
+        db_execute(c, 
+            "UPDATE leave_balance SET granted = ? WHERE user_id = ? AND year = ? AND granted = ?",
+            (data.annual_leave_total, data.user_id, row["year"], row["granted"])
+        )
+        if c.rowcount == 0:
+            conn.rollback()
+            raise HTTPException(status_code=409, detail="연차가 동시에 변경되었습니다. 다시 시도해주세요")
+        adjustments.append((current["tid"], data.user_id, row["year"], "grant", data.annual_leave_total - row["granted"], None))
+    add_leave_entries(c, adjustments)
+    record_change(c, current["tid"], "annual_leave", "update", data.user_id, data.user_id, {
+        "user_id": data.user_id, "annual_leave_total": data.annual_leave_total
+    })
     conn.commit()
+    replica_router.mark_write()
     return {"success": True}
 
 class RoleUpdate(BaseModel):
@@ -923,21 +2853,25 @@ class RoleUpdate(BaseModel):
     role: str  # 'member' or 'admin'
 
 @app.put("/api/user/role")
-def update_user_role(data: RoleUpdate):
+def update_user_role(data: RoleUpdate, current=Depends(require_admin)):
+    check_user_access(current, data.user_id)
     conn = get_db()
     c = conn.cursor()
     db_execute(c, 
         "UPDATE user SET role = ? WHERE id = ?",
         (data.role, data.user_id)
     )
+    # 기존 토큰의 role 정보가 달라지므로 재로그인 필요
+    token_revocations.revoke_user(c, data.user_id)
     conn.commit()
+    replica_router.mark_write()
     role_name = "관리자" if data.role == "admin" else "일반 사용자"
     return {"success": True, "message": f"{role_name}로 변경되었습니다!"}
 
 # --- 회사 설정 ---
 @app.get("/api/settings")
-def get_settings():
-    return COMPANY_SETTINGS
+def get_settings(tenant_id: int = Depends(get_request_tenant)):
+    return tenant_cache.settings(tenant_id)
 
 class SettingsUpdate(BaseModel):
     latitude: float
@@ -945,43 +2879,183 @@ class SettingsUpdate(BaseModel):
     radius_meters: int
 
 @app.put("/api/settings")
-def update_settings(data: SettingsUpdate):
-    """회사 설정 업데이트"""
-    global COMPANY_SETTINGS
-    COMPANY_SETTINGS["latitude"] = data.latitude
-    COMPANY_SETTINGS["longitude"] = data.longitude
-    COMPANY_SETTINGS["radius_meters"] = data.radius_meters
+def update_settings(data: SettingsUpdate, current=Depends(require_admin)):
+    """회사 설정 업데이트 (로그인한 관리자의 회사에만 적용)"""
+    conn = get_db()
+    c = conn.cursor()
+    db_execute(c, "SELECT settings FROM tenant WHERE id = ?", (current["tid"],))
+    settings = json.loads(c.fetchone()["settings"] or "{}")
+    settings.update(latitude=data.latitude, longitude=data.longitude, radius_meters=data.radius_meters)
+    db_execute(c, "UPDATE tenant SET settings = ? WHERE id = ?", (json.dumps(settings), current["tid"]))
+    conn.commit()
+    tenant_cache.invalidate(current["tid"])
     return {"success": True, "message": "설정이 저장되었습니다!"}
 
-# --- 직원 관리 API ---
-@app.get("/api/admin/employees")
-def get_all_employees():
-    """전체 직원 목록 (관리자 포함)"""
+# --- 근무일 달력 ---
+@app.get("/api/calendar")
+def get_calendar(year: int = None, current=Depends(get_current_user)):
+    """연간 근무일 수와 공휴일/회사 휴무일 목록"""
+    year = year or get_kst_today().year
+    check_calendar_year(year)
+    date_from, date_to = f"{year}-01-01", f"{year}-12-31"
+    closures = work_calendar.closures(current["tid"])
+    return {
+        "year": year,
+        "work_days": len(work_calendar.work_days(current["tid"], date_from, date_to)),
+        "holidays": [
+            {"date": d, "name": name, "company": d in closures}
+            for d, name in sorted(work_calendar.holidays(current["tid"], date_from, date_to).items())
+        ]
+    }
+
+class ClosureCreate(BaseModel):
+    date: str
+    name: str
+
+@app.post("/api/admin/calendar/closures")
+def create_closure(data: ClosureCreate, current=Depends(require_admin)):
+    """회사 휴무일 등록 (창립기념일, 하계 휴무 등 - 같은 날짜면 이름만 바꿈)"""
+    parse_calendar_date(data.date)
     conn = get_db()
     c = conn.cursor()
     db_execute(c, """
-        SELECT u.id, u.name, u.email, u.role, u.team_id, t.name as team_name,
-               u.annual_leave_total, u.annual_leave_used
-        FROM user u
-        LEFT JOIN team t ON u.team_id = t.id
-        ORDER BY u.role DESC, u.name
-    """)
+        INSERT INTO company_holiday (tenant_id, date, name) VALUES (?, ?, ?)
+        ON CONFLICT(tenant_id, date) DO UPDATE SET name = excluded.name
+    """, (current["tid"], data.date, data.name))
+    conn.commit()
+    work_calendar.invalidate(current["tid"])
+    return {"success": True, "message": "휴무일이 등록되었습니다!"}
+
+@app.delete("/api/admin/calendar/closures/{day}")
+def delete_closure(day: str, current=Depends(require_admin)):
+    conn = get_db()
+    c = conn.cursor()
+    db_execute(c, "DELETE FROM company_holiday WHERE tenant_id = ? AND date = ?", (current["tid"], day))
+    if c.rowcount == 0:
+        raise HTTPException(status_code=404, detail="휴무일을 찾을 수 없습니다")
+    conn.commit()
+    work_calendar.invalidate(current["tid"])
+    return {"success": True, "message": "휴무일이 삭제되었습니다!"}
+
+# --- 회사 (테넌트) 관리 ---
+class TenantCreate(BaseModel):
+    code: str           # 회원가입 주소에 쓰는 회사 코드 (?tenant=code)
+    name: str
+    admin_email: str
+    admin_password: str
+    admin_name: str = "관리자"
+
+@app.get("/api/admin/tenants")
+def get_tenants(current=Depends(require_operator)):
+    """운영자용: 회사 목록"""
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    db_execute(c, "SELECT id, code, name FROM tenant ORDER BY id")
     return [dict(row) for row in c.fetchall()]
 
+@app.post("/api/admin/tenants")
+def create_tenant(data: TenantCreate, current=Depends(require_operator)):
+    """운영자용: 회사 추가 (기본 팀과 관리자 계정도 함께 생성)"""
+    conn = get_db()
+    c = conn.cursor()
+    db_execute(c, "SELECT id FROM tenant WHERE code = ?", (data.code,))
+    if c.fetchone():
+        raise HTTPException(status_code=400, detail="이미 사용 중인 회사 코드입니다")
+    db_execute(c, "SELECT id FROM user WHERE email = ?", (data.admin_email,))
+    if c.fetchone():
+        raise HTTPException(status_code=400, detail="이미 등록된 이메일입니다")
+    
+    db_execute(c, "INSERT INTO tenant (code, name) VALUES (?, ?) RETURNING id", (data.code, data.name))
+    tenant_id = c.fetchone()["id"]
+    seed_tenant(c, tenant_id, data.admin_name, data.admin_email, hash_password(data.admin_password))
+    conn.commit()
+    replica_router.mark_write()
+    return {"success": True, "id": tenant_id}
+
+# --- 직원 관리 API ---
+EMPLOYEE_COLUMNS = {
+    "id": "u.id",
+    "name": "u.name",
+    "email": "u.email",
+    "role": "u.role",
+    "team_id": "u.team_id",
+    "team_name": "t.name",
+    "annual_leave_total": LEAVE_TOTAL_SQL,
+    "annual_leave_used": LEAVE_USED_SQL
+}
+
+class EmployeeItem(BaseModel):
+    # fields 파라미터로 일부만 요청할 수 있어 모두 Optional
+    id: Optional[int] = None
+    name: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    team_id: Optional[int] = None
+    team_name: Optional[str] = None
+    annual_leave_total: Optional[float] = None
+    annual_leave_used: Optional[float] = None
+
+@app.get("/api/admin/employees", response_model=Union[List[EmployeeItem], ColumnarPayload])
+def get_all_employees(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      fields: Optional[str] = None, team_id: Optional[int] = None,
+                      role: Optional[str] = None, format: str = "rows", current=Depends(require_admin)):
+    """전체 직원 목록 (관리자 포함, 역할 → 이름 순)
+
+    다음 페이지는 X-Next-Cursor 헤더의 cursor로 조회
+    """
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    limit = clamp_limit(limit)
+    selected = select_fields(fields, EMPLOYEE_COLUMNS)
+    
+    # 정렬 키(role, name, id)는 커서 생성을 위해 항상 조회
+    columns = dict.fromkeys(["id", "name", "role"] + selected)
+    select_sql = ", ".join(f"{EMPLOYEE_COLUMNS[f]} AS {f}" for f in columns)
+    join_sql = "LEFT JOIN team t ON u.team_id = t.id" if "team_name" in columns else ""
+    join_params = []
+    if "annual_leave_total" in columns or "annual_leave_used" in columns:
+        join_sql += " " + LEAVE_BALANCE_JOIN
+        join_params.append(get_kst_today().year)
+    
+    conditions, params = ["u.tenant_id = ?"], join_params + [current["tid"]]
+    if team_id is not None:
+        conditions.append("u.team_id = ?")
+        params.append(team_id)
+    if role:
+        conditions.append("u.role = ?")
+        params.append(role)
+    if cursor:
+        last_role, last_name, last_id = decode_cursor(cursor, (str, str, int))
+        conditions.append("(u.role < ? OR (u.role = ? AND (u.name > ? OR (u.name = ? AND u.id > ?))))")
+        params += [last_role, last_role, last_name, last_name, last_id]
+    db_execute(c, f"""
+        SELECT {select_sql}
+        FROM user u
+        {join_sql}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY u.role DESC, u.name, u.id LIMIT ?
+    """, params + [limit + 1])
+    rows = paginate(c.fetchall(), limit, selected, ["role", "name", "id"], response)
+    return rows_response(rows, selected, format, response)
+
 @app.put("/api/admin/reset-password/{user_id}")
-def reset_password(user_id: int):
+def reset_password(user_id: int, current=Depends(require_admin)):
     """비밀번호 초기화 (123456)"""
+    check_user_access(current, user_id)
     conn = get_db()
     c = conn.cursor()
     new_password = hash_password("123456")
     db_execute(c, "UPDATE user SET password = ? WHERE id = ?", (new_password, user_id))
+    token_revocations.revoke_user(c, user_id)
     conn.commit()
+    replica_router.mark_write()
     return {"success": True, "message": "비밀번호가 123456으로 초기화되었습니다!"}
 
 @app.get("/api/admin/attendance-detail/{user_id}")
-def get_attendance_detail(user_id: int, date: str = None):
+def get_attendance_detail(user_id: int, date: str = None, current=Depends(require_admin)):
     """직원 출퇴근 상세 내역 (날짜별)"""
-    conn = get_db()
+    check_user_access(current, user_id)
+    conn = get_db(readonly=True)
     c = conn.cursor()
     target_date = date or get_kst_today().isoformat()
     
@@ -1009,6 +3083,350 @@ def get_attendance_detail(user_id: int, date: str = None):
         "total_minutes": total_minutes
     }
 
+# --- 변경 이력 ---
+@app.get("/api/changes")
+def get_changes(since: Optional[str] = None, limit: Optional[int] = None, current=Depends(require_admin)):
+    """관리자용: since 커서 이후의 출퇴근/휴가 변경을 커밋 순서대로
+
+    처음에는 since 없이 호출하고, 이후에는 응답의 next_cursor를 저장해 두었다가 그대로 전달.
+    has_more가 false면 현재까지의 변경을 모두 받은 것.
+    """
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    limit = clamp_limit(limit)
+    last_id = decode_cursor(since, (int,), signed=False)[0] if since else 0
+    
+    db_execute(c, """
+        SELECT id, entity, op, entity_id, user_id, data, created_at FROM change_log
+        WHERE tenant_id = ? AND id > ? ORDER BY id LIMIT ?
+    """, (current["tid"], last_id, limit + 1))
+    rows = c.fetchall()
+    page = rows[:limit]
+    if page:
+        last_id = page[-1]["id"]
+    return {
+        "changes": [{**dict(row), "data": orjson.loads(row["data"])} for row in page],
+        "next_cursor": encode_cursor([last_id], signed=False),
+        "has_more": len(rows) > limit,
+    }
+
+# ==================== 백그라운드 작업 ====================
+# 여러 워커가 떠 있어도 리더 한 곳에서만 실행
+# - PostgreSQL: advisory lock을 잡은 연결을 유지
+# - SQLite: 잠금 파일 (flock)
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") == "1"
+SCHEDULER_TICK = 30  # 초
+SCHEDULER_LOCK_KEY = 4021  # pg advisory lock 키
+
+class LeaderLock:
+    """프로세스 간 잠금 (key: pg advisory lock 키, path: SQLite일 때 잠금 파일)"""
+
+    def __init__(self, key=(SCHEDULER_LOCK_KEY,), path="flextime.scheduler.lock"):
+        self.key = key
+        self.path = path
+        self._conn = None
+        self._file = None
+
+    def try_acquire(self) -> bool:
+        if self.is_held():
+            return True
+        try:
+            if DATABASE_URL:
+                conn = _connect_postgres(DATABASE_URL)
+                conn.autocommit = True
+                c = conn.cursor()
+                c.execute(f"SELECT pg_try_advisory_lock({', '.join(['%s'] * len(self.key))}) AS locked", self.key)
+                if c.fetchone()["locked"]:
+                    self._conn = conn
+                else:
+                    conn.close()
+            else:
+                try:
+                    import fcntl
+                except ImportError:
+                    # Windows 로컬 실행: 단일 프로세스로 간주
+                    self._file = True
+                    return True
+                f = open(self.path, "w")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self._file = f
+                except OSError:
+                    f.close()
+        except Exception as e:
+            print(f"Scheduler lock failed: {e}")
+        return self.is_held()
+
+    def is_held(self) -> bool:
+        if self._conn is not None:
+            try:
+                self._conn.cursor().execute("SELECT 1")
+            except Exception:
+                # 연결이 끊기면 잠금도 풀린 것
+                self._conn = None
+        return self._conn is not None or self._file is not None
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._file is not None and self._file is not True:
+            self._file.close()
+        self._file = None
+
+class JobRunning(Exception):
+    """같은 작업이 이미 (이 워커나 다른 워커에서) 실행 중"""
+
+class Scheduler:
+    """하루 한 번 실행하는 작업 스케줄러 (lifespan에서 시작/종료)
+
+    작업 시각(KST HH:MM)이 지났고 오늘 아직 안 돌았으면 실행.
+    작업은 스레드에서 돌아가므로 요청 처리를 막지 않음.
+    예약 실행과 관리자 즉시 실행이 겹치지 않도록 작업마다 잠금을 잡고 실행.
+    """
+
+    def __init__(self):
+        self.jobs = {}  # name -> (시각 또는 시각을 돌려주는 함수, fn)
+        self.lock = LeaderLock()
+        self._task = None
+
+    def daily(self, name, at):
+        def register(fn):
+            self.jobs[name] = (at, fn)
+            return fn
+        return register
+
+    def job_time(self, name) -> str:
+        at = self.jobs[name][0]
+        return at() if callable(at) else at
+
+    def start(self):
+        if SCHEDULER_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.lock.release()
+
+    async def _loop(self):
+        while True:
+            try:
+                if await asyncio.to_thread(self.lock.try_acquire):
+                    for name in list(self.jobs):
+                        await asyncio.to_thread(self.run_if_due, name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Scheduler error: {e}")
+            await asyncio.sleep(SCHEDULER_TICK)
+
+    def run_if_due(self, name):
+        now = get_kst_now()
+        today = now.date().isoformat()
+        if now.strftime("%H:%M") < self.job_time(name):
+            return
+        conn = get_db()
+        c = conn.cursor()
+        db_execute(c, "SELECT last_run FROM job_run WHERE name = ?", (name,))
+        row = c.fetchone()
+        if row and row["last_run"] >= today:
+            return
+        try:
+            self.run(name)
+        except JobRunning:
+            # 즉시 실행 중이면 다음 주기에 다시 확인
+            return
+        db_execute(c, """
+            INSERT INTO job_run (name, last_run) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET last_run = excluded.last_run
+        """, (name, today))
+        conn.commit()
+
+    def run(self, name):
+        # 작업마다 별도 잠금 (리더 잠금과 키가 겹치지 않도록 두 정수 키 사용)
+        lock = LeaderLock(
+            key=(SCHEDULER_LOCK_KEY, zlib.crc32(name.encode()) & 0x7fffffff),
+            path=f"flextime.job.{name}.lock"
+        )
+        if not lock.try_acquire():
+            raise JobRunning(name)
+        try:
+            started = time.time()
+            result = self.jobs[name][1]()
+            print(f"[scheduler] {name} 완료 ({time.time() - started:.1f}s): {result}")
+            return result
+        finally:
+            lock.release()
+
+scheduler = Scheduler()
+
+def _minutes_sql(column):
+    """'HH:MM' 텍스트 컬럼 → 분 (SQLite/PostgreSQL 공통)"""
+    return f"(CAST(substr({column}, 1, 2) AS INTEGER) * 60 + CAST(substr({column}, 4, 2) AS INTEGER))"
+
+@scheduler.daily("close_stale_sessions", at=lambda: COMPANY_SETTINGS["auto_close_at"])
+def close_stale_sessions():
+    """전날까지 퇴근 안 한 세션을 회사마다 한 번의 UPDATE로 종료
+
+    퇴근 시간은 그날 일정(없으면 회사 기본값), 출근보다 이르면 출근 시간 (0분 처리)
+    실행 시각은 배포 전체 공통 (COMPANY_SETTINGS의 auto_close_at)
+    """
+    conn = get_db()
+    c = conn.cursor()
+    today = get_kst_today().isoformat()
+    # 닫을 세션마다 퇴근 시간을 한 번만 계산해 두고 UPDATE ... FROM으로 반영
+    # (파라미터: 회사 기본 퇴근 시간, 오늘, 회사 - 각각 한 번씩)
+    stale = """
+        SELECT id, (CASE WHEN planned_out > clock_in THEN planned_out ELSE clock_in END) AS close_time
+        FROM (
+            SELECT a.id, a.clock_in, COALESCE(
+                (SELECT s.planned_out FROM schedule s WHERE s.user_id = a.user_id AND s.date = a.date),
+                ?) AS planned_out
+            FROM attendance a
+            WHERE a.clock_out IS NULL AND a.date < ? AND a.tenant_id = ?
+        ) p
+    """
+    query = f"""
+        UPDATE attendance
+        SET clock_out = t.close_time,
+            work_minutes = {_minutes_sql("t.close_time")} - {_minutes_sql("attendance.clock_in")}
+        FROM ({stale}) t
+        WHERE attendance.id = t.id
+        RETURNING attendance.id, attendance.user_id, attendance.date,
+                  attendance.clock_in, attendance.clock_out, attendance.work_minutes
+    """
+    closed = 0
+    for tenant_id in tenant_ids(c):
+        default_out = tenant_cache.settings(tenant_id)["default_out"]
+        db_execute(c, query, (default_out, today, tenant_id))
+        rows = c.fetchall()
+        for row in rows:
+            record_work_minutes(c, tenant_id, row["user_id"], row["date"], row["work_minutes"])
+        record_changes(c, [
+            (tenant_id, "attendance", "update", row["id"], row["user_id"], attendance_change(row)) for row in rows
+        ])
+        # 회사마다 커밋 (변경 이력 잠금을 다른 회사 처리 동안 잡고 있지 않도록)
+        conn.commit()
+        closed += len(rows)
+    return {"closed": closed}
+
+@scheduler.daily("rollup_work_hours", at="03:30")
+def rollup_work_hours():
+    """최근 2주 근무시간 집계를 attendance 기준으로 다시 계산 (직접 수정된 기록 보정)"""
+    conn = get_db()
+    today = get_kst_today()
+    start = today - timedelta(days=today.weekday() + 7)
+    end = today + timedelta(days=6 - today.weekday())
+    rows = 0
+    for tenant_id in tenant_ids(conn.cursor()):
+        rebuilder = WorkHoursRebuilder(conn, tenant_id, start.isoformat(), end.isoformat())
+        for user_id, day, minutes in iter_daily_minutes(conn, tenant_id, start.isoformat(), end.isoformat()):
+            rebuilder.add(user_id, day, minutes)
+            rows += 1
+        rebuilder.finish()
+    conn.commit()
+    return {"days": rows}
+
+@scheduler.daily("prune_change_log", at="03:45")
+def prune_change_log():
+    """보관 기한이 지난 변경 이력 삭제"""
+    if CHANGE_LOG_RETENTION_DAYS <= 0:
+        return {"deleted": 0}
+    conn = get_db()
+    c = conn.cursor()
+    cutoff = (get_kst_now() - timedelta(days=CHANGE_LOG_RETENTION_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    db_execute(c, "DELETE FROM change_log WHERE created_at < ?", (cutoff,))
+    deleted = c.rowcount
+    conn.commit()
+    return {"deleted": deleted}
+
+@scheduler.daily("prune_token_revocation", at="03:50")
+def prune_token_revocation():
+    """만료된 토큰의 무효화 기록 삭제"""
+    conn = get_db()
+    c = conn.cursor()
+    db_execute(c, "DELETE FROM token_revocation WHERE expires_at < ?", (time.time(),))
+    deleted = c.rowcount
+    conn.commit()
+    return {"deleted": deleted}
+
+@scheduler.daily("leave_year_rollover", at="00:10")
+def leave_year_rollover():
+    """연도가 바뀌면 지난해 남은 연차 소멸 + 올해 연차 부여 후 잔액 캐시를 원장으로 재계산
+
+    매일 돌지만 이미 처리된 해에는 바뀌는 것이 없음 (취소로 지난해 잔액이 생기면 다시 소멸)
+    """
+    conn = get_db()
+    c = conn.cursor()
+    year = get_kst_today().year
+    if DATABASE_URL:
+        # 재계산 중 들어온 사용/취소가 덮어써지지 않도록 잔액 갱신을 잠시 막음
+        db_execute(c, "LOCK TABLE leave_balance IN SHARE ROW EXCLUSIVE MODE")
+    
+    db_execute(c, """
+        SELECT tenant_id, user_id, year, granted - used - expired AS remaining FROM leave_balance
+        WHERE year < ? AND granted - used - expired > 0
+    """, (year,))
+    expired = [(row["tenant_id"], row["user_id"], row["year"], "expire", -row["remaining"], None)
+               for row in c.fetchall()]
+    add_leave_entries(c, expired)
+    
+    db_execute(c, """
+        INSERT INTO leave_balance (tenant_id, user_id, year, granted, used, expired)
+        SELECT tenant_id, id, ?, annual_leave_total, 0, 0 FROM user WHERE true
+        ON CONFLICT(user_id, year) DO NOTHING
+        RETURNING tenant_id, user_id, granted
+    """, (year,))
+    granted = [(row["tenant_id"], row["user_id"], year, "grant", row["granted"], None) for row in c.fetchall()]
+    add_leave_entries(c, granted)
+    
+    if expired or granted:
+        recompute_leave_balances(c, min([entry[2] for entry in expired] + [year]))
+    conn.commit()
+    return {"expired": len(expired), "granted": len(granted)}
+
+@scheduler.daily("db_maintenance", at="04:00")
+def db_maintenance():
+    """통계 갱신 (쿼리 플래너용)"""
+    conn = get_db()
+    if DATABASE_URL:
+        conn.autocommit = True
+    db_execute(conn.cursor(), "ANALYZE")
+    conn.commit()
+    return {"analyzed": True}
+
+@app.get("/api/admin/jobs")
+def get_jobs(current=Depends(require_operator)):
+    """관리자용: 백그라운드 작업 목록과 마지막 실행일"""
+    conn = get_db(readonly=True)
+    c = conn.cursor()
+    db_execute(c, "SELECT name, last_run FROM job_run")
+    last_runs = {row["name"]: row["last_run"] for row in c.fetchall()}
+    return [
+        {"name": name, "at": scheduler.job_time(name), "last_run": last_runs.get(name)}
+        for name in scheduler.jobs
+    ]
+
+@app.post("/api/admin/jobs/{name}/run")
+def run_job(name: str, current=Depends(require_operator)):
+    """관리자용: 백그라운드 작업 즉시 실행"""
+    if name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다")
+    try:
+        result = scheduler.run(name)
+    except JobRunning:
+        raise HTTPException(status_code=409, detail="작업이 이미 실행 중입니다")
+    return {"success": True, "name": name, "result": result}
+
 # ==================== 메인 페이지 ====================
 @app.get("/", response_class=HTMLResponse)
 def read_root():
@@ -0,0 +1,116 @@
+"""비밀번호 해싱 서비스
+
+scrypt KDF는 한 번에 수십 ms의 CPU를 쓰기 때문에 요청 스레드에서 바로 돌리면
+출근 시간대 로그인 폭주 때 워커 전체가 막힌다. 여기서는 KDF를 크기가 제한된
+프로세스 풀에서 실행하고, 요청 스레드는 결과만 기다린다.
+
+풀에 넘기는 함수가 main.py가 아닌 이 모듈을 가리키도록 별도 모듈로 둔다.
+단, spawn 방식 자식 프로세스는 부모의 __main__ 모듈도 __mp_main__으로 다시 import하므로
+`python main.py`로 실행하면 main.py 최상위 코드가 워커마다 실행된다
+(main.py는 이때 init_db()를 건너뛴다. uvicorn main:app으로 실행하면 main.py는 다시 import되지 않음).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+
+# scrypt 파라미터 (n=2^14, r=8 → 약 16MB 메모리, 1회 50ms 안팎)
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SCHEME = "scrypt"
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=SCRYPT_DKLEN
+    )
+
+
+def kdf_hash(password: str) -> str:
+    """scrypt$n$r$p$salt$hash 형식으로 해싱 (프로세스 풀에서 실행됨)"""
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def kdf_verify(password: str, stored: str) -> bool:
+    """scrypt 해시 검증 (프로세스 풀에서 실행됨)"""
+    try:
+        scheme, n, r, p, salt, digest = stored.split("$")
+    except ValueError:
+        return False
+    if scheme != SCHEME:
+        return False
+    computed = _scrypt(password, bytes.fromhex(salt), int(n), int(r), int(p))
+    return hmac.compare_digest(computed.hex(), digest)
+
+
+def legacy_hash(password: str) -> str:
+    """이전 방식 (솔트 없는 SHA-256) - 기존 계정 검증용"""
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def is_legacy_hash(stored: str) -> bool:
+    return "$" not in stored and len(stored) == 64
+
+
+class PasswordHasher:
+    """KDF 연산을 프로세스 풀에서 실행하는 해싱 서비스
+
+    - max_workers: KDF를 동시에 돌리는 프로세스 수
+    - max_pending: 풀에 쌓일 수 있는 최대 작업 수 (초과 시 호출 스레드가 대기)
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.max_pending = max_pending or self.max_workers * 4
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # 멀티스레드 서버에서 fork는 위험하므로 spawn 사용
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._pool
+
+    def _run(self, fn, *args):
+        with self._slots:
+            return self._get_pool().submit(fn, *args).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(kdf_hash, password)
+
+    def verify(self, password: str, stored: str) -> bool:
+        if not stored:
+            return False
+        if is_legacy_hash(stored):
+            # SHA-256은 충분히 빨라서 풀을 거치지 않음
+            return hmac.compare_digest(legacy_hash(password), stored)
+        return self._run(kdf_verify, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """현재 파라미터보다 약하거나 이전 방식이면 True"""
+        return not stored.startswith(f"{SCHEME}${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+    def warm_up(self):
+        """풀 프로세스를 미리 띄워둠 (첫 로그인 지연 방지)"""
+        pool = self._get_pool()
+        for f in [pool.submit(os.getpid) for _ in range(self.max_workers)]:
+            f.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
@@ -0,0 +1,70 @@
+"""테스트 공통 설정
+
+main.py는 import할 때 현재 디렉터리의 flextime.db를 만들므로 임시 디렉터리에서 import하고,
+테스트마다 DB 파일을 지우고 init_db()로 새로 만든다.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.chdir(tempfile.mkdtemp())
+os.environ["SCHEDULER_ENABLED"] = "0"
+os.environ.pop("DATABASE_URL", None)
+os.environ.setdefault("HASH_WORKERS", "1")
+# 관리자 조회를 연달아 호출해도 요청 속도 제한에 걸리지 않도록
+os.environ["ADMISSION_HEAVY_RATE"] = "1000"
+os.environ["ADMISSION_HEAVY_BURST"] = "1000"
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+# 2026-10-19 (월) - 같은 주에 공휴일 없음, 같은 달에 개천절/한글날 있음
+TODAY = date(2026, 10, 19)
+
+
+def set_today(monkeypatch, day):
+    monkeypatch.setattr(main, "get_kst_today", lambda: day)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    set_today(monkeypatch, TODAY)
+    if os.path.exists("flextime.db"):
+        os.remove("flextime.db")
+    main.init_db()
+    main.work_calendar.__init__()
+    main.tenant_cache.__init__()
+    main.token_revocations.__init__()
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def login(client, email, password):
+    res = client.post("/api/auth/login", json={"email": email, "password": password})
+    assert res.status_code == 200, res.text
+    return {"Authorization": f"Bearer {res.json()['token']}"}
+
+
+@pytest.fixture
+def admin(client):
+    return login(client, "admin@jbuh.kr", "123456")
+
+
+def register(client, email, team_id=1, name=None):
+    """직원 가입 → (user_id, 인증 헤더)"""
+    res = client.post("/api/auth/register", json={
+        "name": name or email.split("@")[0], "email": email, "password": "pw", "team_id": team_id
+    })
+    assert res.status_code == 200, res.text
+    return res.json()["user_id"], login(client, email, "pw")
+
+
+def db():
+    conn = main.get_db()
+    return conn, conn.cursor()
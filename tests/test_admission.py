@@ -0,0 +1,111 @@
+"""요청 수용 제어: 토큰 버킷, heavy 대기열, critical 예약 슬롯"""
+import asyncio
+
+import pytest
+
+import main
+from admission import CRITICAL, HEAVY, NORMAL, AdmissionController, Rejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def rejected(coro):
+    with pytest.raises(Rejected) as e:
+        run(coro)
+    return e.value
+
+
+def test_heavy_token_bucket_per_key():
+    async def scenario():
+        ctl = AdmissionController(heavy_rate=0.01, heavy_burst=2)
+        for _ in range(2):
+            await ctl.acquire(HEAVY, "user:1")
+            await ctl.release(HEAVY)
+        # 다른 사용자, 키 없는 요청(다음 페이지)은 차감되지 않음
+        await ctl.acquire(HEAVY, "user:2")
+        await ctl.release(HEAVY)
+        for _ in range(3):
+            await ctl.acquire(HEAVY, None)
+            await ctl.release(HEAVY)
+        try:
+            await ctl.acquire(HEAVY, "user:1")
+        finally:
+            assert ctl.shed["rate_limited"] == 1
+    e = rejected(scenario())
+    assert (e.status_code, e.reason) == (429, "rate_limited")
+    assert e.retry_after > 1
+
+
+def test_heavy_queue_is_bounded_and_times_out():
+    async def scenario():
+        ctl = AdmissionController(heavy_concurrency=1, heavy_queue=1, heavy_queue_timeout=0.1, heavy_burst=100)
+        await ctl.acquire(HEAVY, None)
+        waiting = asyncio.create_task(ctl.acquire(HEAVY, None))
+        await asyncio.sleep(0)
+        assert ctl.heavy_waiting == 1
+        with pytest.raises(Rejected) as full:
+            await ctl.acquire(HEAVY, None)
+        assert full.value.reason == "queue_full"
+        with pytest.raises(Rejected) as timeout:
+            await waiting
+        assert timeout.value.reason == "queue_timeout"
+
+        # 자리가 나면 대기 중인 요청이 이어서 실행
+        waiting = asyncio.create_task(ctl.acquire(HEAVY, None))
+        await asyncio.sleep(0)
+        await ctl.release(HEAVY)
+        await waiting
+        assert ctl.heavy_running == 1 and ctl.heavy_waiting == 0
+    run(scenario())
+
+
+def test_critical_uses_reserved_slots():
+    async def scenario():
+        ctl = AdmissionController(max_concurrency=3, reserved_critical=1, critical_wait=0.1)
+        await ctl.acquire(NORMAL)
+        await ctl.acquire(NORMAL)
+        with pytest.raises(Rejected) as normal:
+            await ctl.acquire(NORMAL)
+        assert (normal.value.status_code, normal.value.reason) == (503, "overloaded")
+        # 일반 요청이 못 쓰는 예약분은 출퇴근이 사용
+        await ctl.acquire(CRITICAL)
+        # 전체가 차면 critical은 잠깐 기다렸다가 자리가 나면 진행
+        waiting = asyncio.create_task(ctl.acquire(CRITICAL))
+        await asyncio.sleep(0.01)
+        await ctl.release(NORMAL)
+        await waiting
+        assert ctl.in_flight == {CRITICAL: 2, NORMAL: 1, HEAVY: 0}
+        with pytest.raises(Rejected) as critical:
+            await ctl.acquire(CRITICAL)
+        assert critical.value.reason == "overloaded"
+    run(scenario())
+
+
+def test_tenant_concurrency():
+    async def scenario():
+        ctl = AdmissionController(tenant_concurrency=1)
+        await ctl.acquire(NORMAL, tenant=1)
+        await ctl.acquire(NORMAL, tenant=2)
+        with pytest.raises(Rejected) as busy:
+            await ctl.acquire(NORMAL, tenant=1)
+        assert busy.value.reason == "tenant_busy"
+        await ctl.release(NORMAL, tenant=1)
+        await ctl.acquire(NORMAL, tenant=1)
+    run(scenario())
+
+
+def test_cursor_exemption_needs_a_paginated_path_and_a_signed_cursor(client, admin, monkeypatch):
+    monkeypatch.setattr(main.admission, "heavy_rate", 0.01)
+    monkeypatch.setattr(main.admission, "heavy_burst", 1)
+    monkeypatch.setattr(main.admission, "_buckets", {})
+    get = lambda url, **params: client.get(url, headers=admin, params=params).status_code
+    assert get("/api/admin/all-status") == 200
+    assert get("/api/admin/all-status") == 429
+    # 페이지가 없는 목록이나 서버가 서명하지 않은 커서로는 면제되지 않음
+    assert get("/api/admin/all-status", cursor=main.encode_cursor(["admin", "관리자", 1])) == 429
+    assert get("/api/admin/employees", cursor="x") == 429
+    assert get("/api/admin/employees", cursor=main.encode_cursor(["admin", "관리자", 1], signed=False)) == 429
+    for _ in range(3):
+        assert get("/api/admin/employees", cursor=main.encode_cursor(["admin", "관리자", 1])) == 200
@@ -0,0 +1,52 @@
+"""토큰 무효화: 로그아웃, 권한 변경이 다른 워커/재시작 후에도 유지되는지"""
+import main
+from conftest import db, login, register
+
+
+def me(client, headers, user_id):
+    return client.get(f"/api/auth/user/{user_id}", headers=headers).status_code
+
+
+def new_worker():
+    """다른 워커(또는 재시작한 워커): 메모리 캐시가 비어 있음"""
+    main.token_revocations.__init__()
+
+
+def test_logout_survives_restart(client):
+    user_id, headers = register(client, "member@jbuh.kr")
+    other = login(client, "member@jbuh.kr", "pw")
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert me(client, headers, user_id) == 401
+    new_worker()
+    assert me(client, headers, user_id) == 401
+    # 다른 기기의 토큰은 그대로
+    assert me(client, other, user_id) == 200
+
+
+def test_demotion_reaches_other_workers(client, admin, monkeypatch):
+    user_id, _ = register(client, "lead@jbuh.kr")
+    res = client.put("/api/user/role", headers=admin, json={"user_id": user_id, "role": "admin"})
+    assert res.status_code == 200
+    lead = login(client, "lead@jbuh.kr", "pw")
+    assert client.get("/api/admin/employees", headers=lead).status_code == 200
+
+    # 다른 워커가 권한을 내림 (이 워커 캐시는 TTL 동안 그대로)
+    conn, c = db()
+    main.db_execute(c, "UPDATE user SET role = 'member' WHERE id = ?", (user_id,))
+    main.TokenRevocations().revoke_user(c, user_id)
+    conn.commit()
+    assert client.get("/api/admin/employees", headers=lead).status_code == 200
+    monkeypatch.setattr(main, "TOKEN_REVOCATION_TTL", 0)
+    assert client.get("/api/admin/employees", headers=lead).status_code == 401
+
+    # 다시 로그인하면 새 권한으로 발급
+    relogin = login(client, "lead@jbuh.kr", "pw")
+    assert client.get("/api/admin/employees", headers=relogin).status_code == 403
+
+
+def test_password_reset_revokes_existing_tokens(client, admin):
+    user_id, headers = register(client, "member@jbuh.kr")
+    assert client.put(f"/api/admin/reset-password/{user_id}", headers=admin).status_code == 200
+    new_worker()
+    assert me(client, headers, user_id) == 401
+    login(client, "member@jbuh.kr", "123456")
@@ -0,0 +1,40 @@
+"""근무일 달력: 음력 공휴일 표 범위, 조회 가능 연도"""
+import pytest
+
+import main
+from holidays_kr import korean_holidays
+from conftest import register
+
+
+def holidays(client, headers, year):
+    res = client.get("/api/calendar", headers=headers, params={"year": year})
+    assert res.status_code == 200, res.text
+    return {h["date"]: h["name"] for h in res.json()["holidays"]}
+
+
+@pytest.mark.parametrize("year", list(main.CALENDAR_YEARS))
+def test_every_calendar_year_has_lunar_holidays(year):
+    names = set(korean_holidays(year).values())
+    assert {"설날", "추석"} <= {n for name in names for n in name.split(", ")}
+    assert any("부처님오신날" in name for name in names)
+
+
+def test_lunar_holidays_in_outer_years(client, admin):
+    assert holidays(client, admin, 2031)["2031-01-23"] == "설날"
+    assert holidays(client, admin, 2017)["2017-10-04"] == "추석"
+    assert holidays(client, admin, 2028)["2028-01-27"] == "설날"
+
+
+def test_years_without_lunar_table_are_rejected(client, admin):
+    first, last = main.CALENDAR_YEARS.start, main.CALENDAR_YEARS.stop - 1
+    for year in (first - 1, last + 1):
+        res = client.get("/api/calendar", headers=admin, params={"year": year})
+        assert res.status_code == 400
+        assert res.json()["detail"] == f"{first}~{last}년만 가능합니다"
+
+
+def test_leave_on_lunar_holiday_is_rejected(client, admin):
+    user_id, headers = register(client, "member@jbuh.kr")
+    res = client.post("/api/leave", headers=headers, json={"user_id": user_id, "date": "2031-01-23", "type": "annual"})
+    assert res.status_code == 400
+    assert "설날" in res.json()["detail"]
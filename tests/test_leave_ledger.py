@@ -0,0 +1,152 @@
+"""연차 원장 / 잔액 캐시 (user-040)"""
+from datetime import date
+
+import pytest
+
+import main
+from conftest import db, register, set_today
+
+
+def balance(client, headers, user_id, year=None):
+    params = {"year": year} if year else {}
+    res = client.get(f"/api/leave/balance/{user_id}", headers=headers, params=params)
+    assert res.status_code == 200, res.text
+    return res.json()
+
+
+def book(client, headers, user_id, day, type="annual"):
+    return client.post("/api/leave", headers=headers, json={"user_id": user_id, "date": day, "type": type})
+
+
+def set_total(client, headers, user_id, total):
+    res = client.put("/api/user/annual-leave", headers=headers, json={"user_id": user_id, "annual_leave_total": total})
+    assert res.status_code == 200, res.text
+
+
+def assert_cache_matches_ledger():
+    """잔액 캐시 = 원장 합계"""
+    conn, c = db()
+    main.db_execute(c, """
+        SELECT b.user_id, b.year, b.granted - b.used - b.expired AS cached, SUM(l.days) AS ledger
+        FROM leave_balance b JOIN leave_ledger l ON l.user_id = b.user_id AND l.year = b.year
+        GROUP BY b.user_id, b.year, b.granted, b.used, b.expired
+    """)
+    for row in c.fetchall():
+        assert row["cached"] == pytest.approx(row["ledger"]), dict(row)
+
+
+def test_half_days_cannot_overspend(client, admin):
+    user_id, headers = register(client, "half@x")
+    set_total(client, admin, user_id, 1.5)
+
+    assert book(client, headers, user_id, "2026-10-20", "half_am").status_code == 200
+    assert book(client, headers, user_id, "2026-10-21").status_code == 200
+    res = book(client, headers, user_id, "2026-10-22", "half_pm")
+    assert res.status_code == 400
+    assert "잔여: 0.0일" in res.json()["detail"]
+
+    # 거절된 신청은 휴가도 원장도 남기지 않음
+    leaves = client.get(f"/api/leave/my/{user_id}", headers=headers).json()
+    assert [l["date"] for l in leaves] == ["2026-10-21", "2026-10-20"]
+    assert balance(client, headers, user_id) == {
+        "user_id": user_id, "year": 2026, "granted": 1.5, "used": 1.5, "expired": 0, "remaining": 0
+    }
+    assert_cache_matches_ledger()
+
+
+def test_cancel_restores_balance(client, admin):
+    user_id, headers = register(client, "cancel@x")
+    book(client, headers, user_id, "2026-10-20", "half_pm")
+    leave_id = client.get(f"/api/leave/my/{user_id}", headers=headers).json()[0]["id"]
+
+    assert client.delete(f"/api/leave/{leave_id}", headers=headers).status_code == 200
+
+    assert balance(client, headers, user_id)["remaining"] == 15
+    kinds = [(e["kind"], e["days"]) for e in client.get(f"/api/leave/ledger/{user_id}", headers=headers).json()]
+    assert kinds == [("grant", 15), ("use", -0.5), ("cancel", 0.5)]
+    assert_cache_matches_ledger()
+
+
+def test_leave_is_charged_to_its_own_year(client, admin):
+    user_id, headers = register(client, "next@x")
+    set_total(client, admin, user_id, 1)
+    assert book(client, headers, user_id, "2026-10-20").status_code == 200
+    # 내년 휴가는 내년 연차에서 차감
+    assert book(client, headers, user_id, "2027-01-05").status_code == 200
+    assert balance(client, headers, user_id, 2027)["remaining"] == 0
+
+    # 총량을 바꾸면 이미 생긴 내년 잔액도 조정
+    set_total(client, admin, user_id, 3)
+    assert balance(client, headers, user_id, 2026)["remaining"] == 2
+    assert balance(client, headers, user_id, 2027)["remaining"] == 2
+    assert_cache_matches_ledger()
+
+
+def test_past_years_cannot_be_booked(client, admin):
+    user_id, headers = register(client, "past@x")
+    for day in ("2016-03-02", "2019-06-03", "2025-12-30"):
+        res = book(client, headers, user_id, day)
+        assert res.status_code == 400, day
+    # 지난 연도 잔액/부여 기록이 생기지 않음
+    conn, c = db()
+    main.db_execute(c, "SELECT COUNT(*) AS cnt FROM leave_balance WHERE user_id = ? AND year < 2026", (user_id,))
+    assert c.fetchone()["cnt"] == 0
+    main.ensure_leave_year(c, user_id, 2019)
+    main.db_execute(c, "SELECT COUNT(*) AS cnt FROM leave_ledger WHERE user_id = ? AND year < 2026", (user_id,))
+    assert c.fetchone()["cnt"] == 0
+    assert balance(client, headers, user_id)["remaining"] == 15
+    # 올해 지난 날짜는 그대로 등록 가능
+    assert book(client, headers, user_id, "2026-01-05").status_code == 200
+
+
+def test_rollover_expires_and_re_expires_after_cancel(client, admin, monkeypatch):
+    user_id, headers = register(client, "roll@x")
+    set_total(client, admin, user_id, 2)
+    book(client, headers, user_id, "2026-10-20")
+    leave_id = client.get(f"/api/leave/my/{user_id}", headers=headers).json()[0]["id"]
+
+    set_today(monkeypatch, date(2027, 1, 1))
+    result = main.leave_year_rollover()
+    assert result["expired"] >= 1 and result["granted"] >= 1
+    assert balance(client, headers, user_id, 2026)["expired"] == 1
+    assert balance(client, headers, user_id, 2027)["granted"] == 2
+    # 이미 처리된 해에는 바뀌는 것이 없음
+    assert main.leave_year_rollover() == {"expired": 0, "granted": 0}
+
+    # 지난해 휴가를 취소하면 잔액이 생기고, 다음 실행에서 다시 소멸
+    client.delete(f"/api/leave/{leave_id}", headers=headers)
+    assert balance(client, headers, user_id, 2026)["remaining"] == 1
+    assert main.leave_year_rollover() == {"expired": 1, "granted": 0}
+    assert balance(client, headers, user_id, 2026) == {
+        "user_id": user_id, "year": 2026, "granted": 2, "used": 0, "expired": 2, "remaining": 0
+    }
+    assert_cache_matches_ledger()
+
+
+def test_migration_builds_balances_from_existing_leave(client, admin):
+    user_id, headers = register(client, "legacy@x")
+    # 원장 도입 전 데이터: 지난해/올해/내년 휴가와 틀어진 annual_leave_used
+    conn, c = db()
+    main.db_execute(c, "DELETE FROM leave_ledger")
+    main.db_execute(c, "DELETE FROM leave_balance")
+    main.db_execute(c, "UPDATE user SET annual_leave_used = 7 WHERE id = ?", (user_id,))
+    main.db_execute_values(c, "INSERT INTO leave (tenant_id, user_id, date, type) VALUES {values}", [
+        (1, user_id, "2025-05-07", "annual"),
+        (1, user_id, "2026-03-03", "annual"),
+        (1, user_id, "2026-03-04", "half_am"),
+        (1, user_id, "2027-01-05", "annual"),
+    ])
+    conn.commit()
+
+    main.init_db()
+
+    assert balance(client, headers, user_id, 2026) == {
+        "user_id": user_id, "year": 2026, "granted": 15, "used": 1.5, "expired": 0, "remaining": 13.5
+    }
+    assert balance(client, headers, user_id, 2027)["used"] == 1
+    # 원장 이전 연도는 옮기지 않음
+    assert client.get(f"/api/leave/ledger/{user_id}", headers=headers, params={"year": 2025}).json() == []
+    # 로그인/사용자 조회도 잔액 캐시 기준
+    user = client.get(f"/api/auth/user/{user_id}", headers=headers).json()
+    assert (user["annual_leave_total"], user["annual_leave_used"]) == (15, 1.5)
+    assert_cache_matches_ledger()
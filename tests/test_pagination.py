@@ -0,0 +1,74 @@
+"""키셋 페이지네이션 (user-029)"""
+import pytest
+
+import main
+from conftest import db, register
+
+
+def fetch_all(client, headers, url, **params):
+    """X-Next-Cursor를 따라 끝까지 → (행 목록, 페이지 수)"""
+    rows, pages, cursor = [], 0, None
+    while True:
+        res = client.get(url, headers=headers, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert res.status_code == 200, res.text
+        rows += res.json()
+        pages += 1
+        cursor = res.headers.get("x-next-cursor")
+        if not cursor:
+            return rows, pages
+
+
+def add_employees(names):
+    conn, c = db()
+    main.db_execute_values(c, "INSERT INTO user (tenant_id, name, email, password, team_id, role) VALUES {values}", [
+        (1, name, f"{i}@x", "x", 1, role) for i, (name, role) in enumerate(names)
+    ])
+    conn.commit()
+
+
+def test_employees_pages_cover_every_row_once_in_order(client, admin):
+    # 같은 이름, 역할 섞임 - 정렬 키 (role DESC, name, id)
+    add_employees([(f"직원{i % 7}", "admin" if i % 10 == 0 else "member") for i in range(53)])
+
+    rows, pages = fetch_all(client, admin, "/api/admin/employees", limit=5, fields="id,name,role")
+    everyone = client.get("/api/admin/employees", headers=admin, params={"limit": 1000}).json()
+
+    assert pages == 11
+    assert [r["id"] for r in rows] == [r["id"] for r in everyone]
+    assert len({r["id"] for r in rows}) == 54
+    assert rows == sorted(rows, key=lambda r: (r["role"] != "member", r["name"], r["id"]))
+    assert set(rows[0]) == {"id", "name", "role"}
+
+
+def test_employees_filters_apply_on_every_page(client, admin):
+    add_employees([(f"직원{i}", "member") for i in range(12)])
+    rows, _ = fetch_all(client, admin, "/api/admin/employees", limit=5, role="admin")
+    assert [r["email"] for r in rows] == ["admin@jbuh.kr"]
+
+
+def test_my_leaves_newest_first(client):
+    user_id, headers = register(client, "leave@x")
+    for day in ("2026-10-20", "2026-10-21", "2026-10-22", "2026-10-23", "2026-10-26"):
+        client.post("/api/leave", headers=headers, json={"user_id": user_id, "date": day, "type": "half_am"})
+
+    rows, pages = fetch_all(client, headers, f"/api/leave/my/{user_id}", limit=2)
+    assert pages == 3
+    assert [r["date"] for r in rows] == ["2026-10-26", "2026-10-23", "2026-10-22", "2026-10-21", "2026-10-20"]
+
+
+def test_teams_by_id(client):
+    rows, pages = fetch_all(client, None, "/api/teams", limit=1)
+    assert pages == 3
+    assert [r["name"] for r in rows] == list(main.DEFAULT_TEAMS)
+
+
+@pytest.mark.parametrize("values", [[{}, 1, 2], ["member", "이름"], ["member", "이름", "3"], "x"])
+def test_malformed_cursor_is_rejected(client, admin, values):
+    cursor = main.encode_cursor(values)
+    res = client.get("/api/admin/employees", headers=admin, params={"cursor": cursor})
+    assert res.status_code == 400
+
+
+def test_garbage_cursor_is_rejected(client):
+    assert client.get("/api/teams", params={"cursor": "!!not-base64"}).status_code == 400
+    assert client.get("/api/teams", params={"cursor": main.encode_cursor([True])}).status_code == 400
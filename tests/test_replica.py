@@ -0,0 +1,51 @@
+"""복제본 라우팅: 쓰기 직후 읽기는 워커가 달라도 primary로"""
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+
+
+def worker():
+    """복제본 하나(지연 0)를 보는 워커 - 메모리는 워커끼리 공유하지 않음"""
+    router = main.ReplicaRouter(["replica"])
+    router._lag["replica"] = (time.time() + 3600, 0.0)
+    app = FastAPI()
+    app.add_middleware(main.ReadYourWritesMiddleware, router=router)
+
+    @app.post("/write")
+    def write():
+        router.mark_write()
+        return {"read_from": router.pick() or "primary"}
+
+    @app.get("/read")
+    def read():
+        return {"read_from": router.pick() or "primary"}
+
+    return TestClient(app)
+
+
+def test_read_after_write_goes_to_primary_on_any_worker(monkeypatch):
+    a, b = worker(), worker()
+    assert b.get("/read").json()["read_from"] == "replica"
+
+    res = a.post("/write")
+    assert res.json()["read_from"] == "primary"
+    assert main.READ_YOUR_WRITES_COOKIE in res.headers["set-cookie"]
+
+    # 같은 클라이언트(쿠키)가 다른 워커로 가도 primary
+    b.cookies = a.cookies
+    assert b.get("/read").json()["read_from"] == "primary"
+    # 쿠키가 없는 다른 클라이언트는 복제본
+    assert worker().get("/read").json()["read_from"] == "replica"
+    # 창이 지나면 다시 복제본
+    monkeypatch.setattr(main, "READ_YOUR_WRITES_WINDOW", 0)
+    assert b.get("/read").json()["read_from"] == "replica"
+
+
+def test_reads_do_not_set_cookie():
+    client = worker()
+    assert "set-cookie" not in client.get("/read").headers
+    client.cookies.set(main.READ_YOUR_WRITES_COOKIE, "garbage")
+    assert client.get("/read").json()["read_from"] == "replica"
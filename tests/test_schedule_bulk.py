@@ -0,0 +1,95 @@
+"""일정 일괄 계획 (upsert, 충돌 요약) / 일괄 조회"""
+import main
+from conftest import db, register
+
+WEEKDAYS = [{"weekdays": [0, 1, 2, 3, 4], "planned_in": "10:00", "planned_out": "19:00"}]
+
+
+def plan(client, headers, **body):
+    body.setdefault("patterns", WEEKDAYS)
+    res = client.post("/api/schedule/bulk", headers=headers, json=body)
+    assert res.status_code == 200, res.text
+    return res.json()
+
+
+def stored():
+    conn, c = db()
+    main.db_execute(c, "SELECT user_id, date, planned_in, planned_out FROM schedule")
+    return {(row["user_id"], row["date"]): (row["planned_in"], row["planned_out"]) for row in c.fetchall()}
+
+
+def test_plan_team_upserts_changed_rows_only(client, admin):
+    first, _ = register(client, "first@jbuh.kr")
+    second, _ = register(client, "second@jbuh.kr")
+    register(client, "other@jbuh.kr", team_id=2)
+    # 10/5(월)~10/16(금) 평일 10일 중 개천절 대체공휴일(10/5)과 한글날(10/9) 제외
+    span = {"team_id": 1, "date_from": "2026-10-05", "date_to": "2026-10-16"}
+
+    preview = plan(client, admin, dry_run=True, **span)
+    assert (preview["users"], preview["written"]) == (2, 16)
+    assert [h["date"] for h in preview["skipped_holidays"]] == ["2026-10-05", "2026-10-09"]
+    assert stored() == {}
+
+    result = plan(client, admin, **span)
+    assert (result["written"], result["unchanged"]) == (16, 0)
+    schedules = stored()
+    assert len(schedules) == 16
+    assert schedules[(first, "2026-10-06")] == ("10:00", "19:00")
+    assert (second, "2026-10-09") not in schedules
+
+    again = plan(client, admin, **span)
+    assert (again["written"], again["unchanged"]) == (0, 16)
+    assert again["conflicts"]["changed"]["count"] == 0
+
+
+def test_conflicts_with_leave_and_existing_schedule(client, admin):
+    user_id, headers = register(client, "member@jbuh.kr")
+    res = client.post("/api/leave", headers=headers, json={"user_id": user_id, "date": "2026-11-02", "type": "annual"})
+    assert res.status_code == 200, res.text
+    plan(client, admin, user_ids=[user_id], date_from="2026-11-03", date_to="2026-11-03",
+         patterns=[{"weekdays": [1], "planned_in": "08:00", "planned_out": "17:00"}])
+    span = {"user_ids": [user_id], "date_from": "2026-11-02", "date_to": "2026-11-06"}
+
+    kept = plan(client, admin, overwrite=False, **span)
+    assert kept["written"] == 3
+    assert kept["conflicts"]["leave"] == {
+        "count": 1, "sample": [{"user_id": user_id, "date": "2026-11-02", "type": "annual"}], "truncated": False
+    }
+    assert kept["conflicts"]["changed"]["sample"] == [
+        {"user_id": user_id, "date": "2026-11-03", "planned_in": "08:00", "planned_out": "17:00"}
+    ]
+    assert stored()[(user_id, "2026-11-03")] == ("08:00", "17:00")
+    assert (user_id, "2026-11-02") not in stored()
+
+    replaced = plan(client, admin, **span)
+    assert (replaced["written"], replaced["unchanged"]) == (1, 3)
+    assert replaced["conflicts"]["changed"]["count"] == 1
+    assert stored()[(user_id, "2026-11-03")] == ("10:00", "19:00")
+
+
+def test_conflict_sample_is_capped(client, admin):
+    user_id, _ = register(client, "member@jbuh.kr")
+    span = {"user_ids": [user_id], "date_from": "2026-11-01", "date_to": "2027-03-31", "skip_holidays": False}
+    every_day = [{"weekdays": list(range(7)), "planned_in": "08:00", "planned_out": "17:00"}]
+    assert plan(client, admin, patterns=every_day, **span)["written"] == 151
+
+    changed = plan(client, admin, dry_run=True, patterns=[dict(every_day[0], planned_in="09:00")], **span)
+    conflict = changed["conflicts"]["changed"]
+    assert (conflict["count"], len(conflict["sample"]), conflict["truncated"]) == (151, main.BULK_CONFLICT_SAMPLE, True)
+    assert conflict["sample"][0]["date"] == "2026-11-01"
+
+
+def test_bulk_read_columnar(client, admin):
+    user_id, _ = register(client, "member@jbuh.kr")
+    plan(client, admin, user_ids=[user_id], date_from="2026-11-02", date_to="2026-11-02")
+    res = client.get("/api/schedule/bulk", headers=admin, params={
+        "user_ids": str(user_id), "date_from": "2026-11-02", "date_to": "2026-11-03", "format": "columnar"
+    })
+    assert res.status_code == 200, res.text
+    body = res.json()
+    assert body["count"] == 2
+    columns = body["columns"]
+    assert list(columns) == main.SCHEDULE_FIELDS
+    assert columns["date"] == ["2026-11-02", "2026-11-03"]
+    assert columns["planned_in"] == ["10:00", main.COMPANY_SETTINGS["default_in"]]
+    assert columns["is_default"] == [False, True]
@@ -0,0 +1,54 @@
+"""백그라운드 작업: 미퇴근 세션 자동 종료, 즉시 실행 잠금"""
+import main
+from conftest import TODAY, db, register
+
+
+def add_open_session(user_id, day, clock_in, planned_out=None):
+    conn, c = db()
+    main.db_execute(c, "INSERT INTO attendance (tenant_id, user_id, date, clock_in) VALUES (?, ?, ?, ?)",
+                    (main.DEFAULT_TENANT_ID, user_id, day, clock_in))
+    if planned_out:
+        main.db_execute(c, "INSERT INTO schedule (tenant_id, user_id, date, planned_in, planned_out) VALUES (?, ?, ?, ?, ?)",
+                        (main.DEFAULT_TENANT_ID, user_id, day, clock_in, planned_out))
+    conn.commit()
+
+
+def sessions():
+    conn, c = db()
+    main.db_execute(c, "SELECT user_id, date, clock_out, work_minutes FROM attendance ORDER BY user_id, date")
+    return {(row["user_id"], row["date"]): (row["clock_out"], row["work_minutes"]) for row in c.fetchall()}
+
+
+def test_close_stale_sessions(client, admin):
+    scheduled, _ = register(client, "scheduled@jbuh.kr")
+    late, _ = register(client, "late@jbuh.kr")
+    plain, _ = register(client, "plain@jbuh.kr")
+    yesterday = "2026-10-18"
+    add_open_session(scheduled, yesterday, "09:00", planned_out="18:30")
+    add_open_session(late, yesterday, "19:00")
+    add_open_session(plain, yesterday, "08:15")
+    add_open_session(plain, TODAY.isoformat(), "08:10")
+
+    res = client.post("/api/admin/jobs/close_stale_sessions/run", headers=admin)
+    assert res.status_code == 200, res.text
+    assert res.json()["result"] == {"closed": 3}
+
+    closed = sessions()
+    assert closed[(scheduled, yesterday)] == ("18:30", 570)
+    # 기본 퇴근 시간(17:00)보다 늦게 출근 → 출근 시간으로 닫고 0분
+    assert closed[(late, yesterday)] == ("19:00", 0)
+    assert closed[(plain, yesterday)] == ("17:00", 525)
+    # 오늘 세션은 그대로
+    assert closed[(plain, TODAY.isoformat())] == (None, 0)
+
+
+def test_run_job_refuses_while_running(client, admin):
+    lock = main.LeaderLock(path="flextime.job.close_stale_sessions.lock")
+    assert lock.try_acquire()
+    try:
+        res = client.post("/api/admin/jobs/close_stale_sessions/run", headers=admin)
+        assert res.status_code == 409
+    finally:
+        lock.release()
+    res = client.post("/api/admin/jobs/close_stale_sessions/run", headers=admin)
+    assert res.status_code == 200